@@ -22,12 +22,17 @@ The pagare settings are located in the accounting journals configuration page.
         'security/ir.model.access.csv',
         'data/report_paperformat.xml',
         'data/account_pagare_printing_data.xml',
+        'data/ir_cron_data.xml',
         'views/account_payment_pagare_report_view.xml',
         'views/report_pagare_base.xml',
         'views/account_journal_views.xml',
         'views/account_payment_views.xml',
+        'views/account_payment_pagare_print_job_views.xml',
+        'views/account_pagare_stats_views.xml',
         'report/account_pagare_printing_report.xml',
         'wizard/print_prenumbered_pagares_views.xml',
+        'wizard/issue_pagares_views.xml',
+        'wizard/export_pagares_views.xml',
     ],
     'installable': True,
     'auto_install': False,
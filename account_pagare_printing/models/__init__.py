@@ -3,6 +3,14 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 from . import account_payment_pagare_report
+from . import account_pagare_stats
+from . import pagare_amount_words
+from . import pagare_pdf_cache
+from . import ir_actions_report
+from . import account_invoice
 from . import account_journal
+from . import account_move_line
+from . import account_payment_method
 from . import account_payment
+from . import account_payment_pagare_print_job
 from . import chart_template
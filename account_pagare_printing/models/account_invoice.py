@@ -0,0 +1,39 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+from odoo.addons.account.models.account_payment import MAP_INVOICE_TYPE_PARTNER_TYPE
+
+
+class AccountInvoice(models.Model):
+    _inherit = 'account.invoice'
+
+    @api.multi
+    def _get_pagare_due_date(self):
+        """ Return the earliest due date of the invoices """
+        if not self:
+            return False
+        self.env.cr.execute("SELECT MIN(date_due) FROM account_invoice WHERE id IN %s", (tuple(self.ids),))
+        return fields.Date.to_string(self.env.cr.fetchone()[0]) or False
+
+    @api.multi
+    def _get_pagare_due_dates(self):
+        """ Return the earliest due date of the invoices for each group of the register
+            payments wizard multi mode, that is, for each (commercial partner, partner type).
+        """
+        due_dates = {}
+        if not self:
+            return due_dates
+        self.env.cr.execute("""
+            SELECT commercial_partner_id, type, MIN(date_due)
+              FROM account_invoice
+             WHERE id IN %s
+          GROUP BY commercial_partner_id, type
+        """, (tuple(self.ids),))
+        for partner_id, invoice_type, date_due in self.env.cr.fetchall():
+            key = (partner_id, MAP_INVOICE_TYPE_PARTNER_TYPE[invoice_type])
+            date_due = fields.Date.to_string(date_due) or False
+            if not due_dates.get(key) or (date_due and date_due < due_dates[key]):
+                due_dates[key] = date_due
+        return due_dates
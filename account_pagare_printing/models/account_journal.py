@@ -2,34 +2,55 @@
 # @author Jose F. Fernandez
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+import threading
+
 from odoo import models, fields, api, _
-from odoo.exceptions import ValidationError
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools.misc import formatLang
+from odoo.tools.sql import column_exists, create_column
+
+import logging
+
+_logger = logging.getLogger(__name__)
 
 
 class AccountJournal(models.Model):
     _inherit = "account.journal"
 
-    @api.one
-    @api.depends('type', 'outbound_payment_method_ids')
+    @api.depends('type', 'outbound_payment_method_ids.code')
     def _compute_pagare_printing_outbound_payment_method_selected(self):
-        self.pagare_printing_outbound_payment_method_selected = self.type in ('bank', 'cash') and \
-                                                                any(pm.code == 'pagare_printing' for pm in
-                                                                    self.outbound_payment_method_ids)
+        for journal in self:
+            journal.pagare_printing_outbound_payment_method_selected = journal.type in ('bank', 'cash') and \
+                any(pm.code == 'pagare_printing' for pm in journal.outbound_payment_method_ids)
 
-    @api.one
-    @api.depends('type', 'inbound_payment_method_ids')
+    @api.depends('type', 'inbound_payment_method_ids.code')
     def _compute_pagare_printing_inbound_payment_method_selected(self):
-        self.pagare_printing_inbound_payment_method_selected = self.type in ('bank', 'cash') and \
-                                                               any(pm.code == 'pagare_printing' for pm in
-                                                                   self.inbound_payment_method_ids)
+        for journal in self:
+            journal.pagare_printing_inbound_payment_method_selected = journal.type in ('bank', 'cash') and \
+                any(pm.code == 'pagare_printing' for pm in journal.inbound_payment_method_ids)
 
-    @api.one
-    @api.depends('pagare_manual_sequencing')
+    @api.depends('pagare_manual_sequencing', 'pagare_sequence_id')
     def _get_pagare_next_number(self):
-        if self.pagare_sequence_id:
-            self.pagare_next_number = self.pagare_sequence_id.number_next_actual
-        else:
-            self.pagare_next_number = 1
+        # Read the next number of the gapless sequences of all the journals at once
+        next_numbers = {}
+        journals = self.filtered('id')
+        if journals:
+            self.env.cr.execute("""
+                SELECT journal.id, sequence.number_next, sequence.implementation
+                  FROM account_journal journal
+                  JOIN ir_sequence sequence ON sequence.id = journal.pagare_sequence_id
+                 WHERE journal.id IN %s
+            """, (tuple(journals.ids),))
+            for journal_id, number_next, implementation in self.env.cr.fetchall():
+                if implementation == 'no_gap':
+                    next_numbers[journal_id] = number_next
+        for journal in self:
+            if journal.id in next_numbers:
+                journal.pagare_next_number = next_numbers[journal.id]
+            elif journal.pagare_sequence_id:
+                journal.pagare_next_number = journal.pagare_sequence_id.number_next_actual
+            else:
+                journal.pagare_next_number = 1
 
     @api.one
     def _set_pagare_next_number(self):
@@ -48,10 +69,10 @@ class AccountJournal(models.Model):
                                         inverse='_set_pagare_next_number',
                                         help="Sequence number of the next printed pagare.")
     pagare_printing_outbound_payment_method_selected = fields.Boolean(
-        compute='_compute_pagare_printing_outbound_payment_method_selected',
+        compute='_compute_pagare_printing_outbound_payment_method_selected', store=True,
         help="Technical feature used to know whether pagare printing was enabled as outbound payment method.")
     pagare_printing_inbound_payment_method_selected = fields.Boolean(
-        compute='_compute_pagare_printing_inbound_payment_method_selected',
+        compute='_compute_pagare_printing_inbound_payment_method_selected', store=True,
         help="Technical feature used to know whether pagare printing was enabled as inbound payment method.")
     pagare_outbound_bridge_account_id = fields.Many2one(comodel_name='account.account',
                                                         string='Outbound Pagare Bridge Account',
@@ -67,6 +88,65 @@ class AccountJournal(models.Model):
                                                 domain=[('type', '=', 'general')],
                                                 help="Journal to post the payment move, if different from this one.")
     pagare_layout_id = fields.Many2one(comodel_name='account.payment.pagare.report', string="Pagare printing format")
+    pagare_last_number = fields.Integer(string='Last Pagare Number', readonly=True, copy=False,
+                                        help="Highest pagare number used by the payments of this journal.")
+    pagare_num_to_print = fields.Integer(compute='_compute_pagare_dashboard_datas')
+    pagare_sum_to_print = fields.Float(compute='_compute_pagare_dashboard_datas')
+    pagare_num_overdue = fields.Integer(compute='_compute_pagare_dashboard_datas')
+    pagare_print_chunk_size = fields.Integer(string='Pagares per Print Chunk', default=0,
+                                             help="If set, printing more pagares than this number creates a print job "
+                                                  "that renders them in the background, in chunks of this size.")
+
+    @api.model_cr_context
+    def _auto_init(self):
+        # Create and fill the high-water mark in SQL from the numbers already used
+        if not column_exists(self.env.cr, self._table, 'pagare_last_number'):
+            create_column(self.env.cr, self._table, 'pagare_last_number', 'int4')
+            if column_exists(self.env.cr, 'account_payment', 'pagare_number'):
+                self.env.cr.execute("""
+                    UPDATE account_journal journal
+                       SET pagare_last_number = payment.last_number
+                      FROM (SELECT journal_id, MAX(pagare_number) AS last_number
+                              FROM account_payment
+                             WHERE pagare_number != 0
+                          GROUP BY journal_id) payment
+                     WHERE payment.journal_id = journal.id
+                """)
+        # Fill the stored pagare flags in SQL instead of computing them journal by journal
+        flags = ['pagare_printing_outbound_payment_method_selected', 'pagare_printing_inbound_payment_method_selected']
+        missing_flags = [flag for flag in flags if not column_exists(self.env.cr, self._table, flag)]
+        for flag in missing_flags:
+            create_column(self.env.cr, self._table, flag, 'boolean')
+        if missing_flags:
+            self._update_pagare_method_flags()
+        return super(AccountJournal, self)._auto_init()
+
+    @api.model
+    def _update_pagare_method_flags(self, journal_ids=None):
+        """ Recompute the stored pagare flags with one statement, after changing the payment
+            methods of the journals in SQL. All the journals if journal_ids is None.
+        """
+        sets = []
+        for fname, flag in (('outbound_payment_method_ids', 'pagare_printing_outbound_payment_method_selected'),
+                            ('inbound_payment_method_ids', 'pagare_printing_inbound_payment_method_selected')):
+            field = self._fields[fname]
+            sets.append("""
+                {flag} = journal.type IN ('bank', 'cash') AND EXISTS (
+                    SELECT 1
+                      FROM {relation} rel
+                      JOIN account_payment_method method ON method.id = rel.{method_column}
+                     WHERE rel.{journal_column} = journal.id AND method.code = 'pagare_printing')
+            """.format(flag=flag, relation=field.relation, journal_column=field.column1,
+                       method_column=field.column2))
+        query = "UPDATE account_journal journal SET %s" % ','.join(sets)
+        if journal_ids is None:
+            self.env.cr.execute(query)
+            self.invalidate_cache(['pagare_printing_outbound_payment_method_selected',
+                                   'pagare_printing_inbound_payment_method_selected'])
+        elif journal_ids:
+            self.env.cr.execute(query + " WHERE journal.id IN %s", (tuple(journal_ids),))
+            self.invalidate_cache(['pagare_printing_outbound_payment_method_selected',
+                                   'pagare_printing_inbound_payment_method_selected'], list(journal_ids))
 
     @api.model
     def create(self, vals):
@@ -93,6 +173,202 @@ class AccountJournal(models.Model):
             'company_id': self.company_id.id,
         })
 
+    @api.multi
+    def _reserve_pagare_numbers(self, count):
+        """ Reserve a contiguous block of count pagare numbers from the journal gapless
+            sequence with a single locked update, and return them as a list.
+
+            The update belongs to the current transaction, so a rollback gives the whole
+            block back and the numbering stays gapless.
+
+            The numbers always start after the last pagare number used in the journal, which
+            may be above the sequence after a switch from pre-numbered pagares or a reset of
+            the sequence, so that they never conflict with the numbers already used.
+        """
+        self.ensure_one()
+        if count <= 0:
+            return []
+        if not self.pagare_sequence_id:
+            self._create_pagare_sequence()
+        sequence = self.pagare_sequence_id.sudo()
+        if sequence.implementation != 'no_gap' or sequence.use_date_range:
+            # The counter of a standard sequence is a postgres sequence, not the number_next column
+            numbers = [int(sequence.next_by_id()) for i in range(count)]
+            last_number = self._lock_pagare_last_number()
+            if min(numbers) <= last_number:
+                sequence.write({'number_next': last_number + 1})
+                numbers = [int(sequence.next_by_id()) for i in range(count)]
+                # The counters of the date ranges are not moved, tell which number is taken
+                self._check_pagare_numbers_available(min(numbers), max(numbers) - min(numbers) + 1,
+                                                     self.env['account.payment'])
+            return numbers
+        self.env.cr.execute("""
+            UPDATE ir_sequence
+               SET number_next = GREATEST(number_next, journal.last_number + 1) + number_increment * %s
+              FROM (SELECT COALESCE(pagare_last_number, 0) AS last_number
+                      FROM account_journal
+                     WHERE id = %s) journal
+             WHERE ir_sequence.id = %s
+         RETURNING number_next - number_increment * %s, number_increment
+        """, (count, self.id, sequence.id, count))
+        first_number, increment = self.env.cr.fetchone()
+        sequence.invalidate_cache(['number_next', 'number_next_actual'], sequence.ids)
+        return [first_number + increment * i for i in range(count)]
+
+    @api.model
+    def _update_pagare_last_numbers(self, last_numbers):
+        """ Raise the high-water mark of the journals to the given numbers if they are greater.
+
+            :param last_numbers: dict mapping journal ids to the highest pagare number just used
+        """
+        last_numbers = {journal_id: number for journal_id, number in last_numbers.items() if journal_id and number}
+        if not last_numbers:
+            return
+        self.env.cr.execute("""
+            UPDATE account_journal journal
+               SET pagare_last_number = vals.number
+              FROM unnest(%s::int[], %s::int[]) AS vals(id, number)
+             WHERE journal.id = vals.id
+               AND COALESCE(journal.pagare_last_number, 0) < vals.number
+        """, (list(last_numbers), list(last_numbers.values())))
+        self.invalidate_cache(['pagare_last_number'], list(last_numbers))
+
+    @api.multi
+    def _lock_pagare_last_number(self):
+        """ Lock the journal row until the end of the transaction, so that concurrent prints of
+            pre-numbered pagares on the same journal are serialized, and return the up-to-date
+            high-water mark.
+
+            FOR NO KEY UPDATE does not conflict with the key share locks taken by the moves and
+            payments inserted on the journal, so its accounting is not blocked meanwhile.
+        """
+        self.ensure_one()
+        self.env.cr.execute("SELECT pagare_last_number FROM account_journal WHERE id = %s FOR NO KEY UPDATE",
+                            (self.id,))
+        self.invalidate_cache(['pagare_last_number'], self.ids)
+        return self.env.cr.fetchone()[0] or 0
+
+    @api.multi
+    def _check_pagare_numbers_available(self, first_number, count, payments):
+        """ Check that no payment of the journal other than the given ones already uses a number
+            of the range [first_number, first_number + count).
+        """
+        self.ensure_one()
+        self.env.cr.execute("""
+            SELECT pagare_number
+              FROM account_payment
+             WHERE journal_id = %s
+               AND pagare_number BETWEEN %s AND %s
+               AND id NOT IN %s
+          ORDER BY pagare_number
+             LIMIT 1
+        """, (self.id, first_number, first_number + count - 1, tuple(payments.ids) or (0,)))
+        row = self.env.cr.fetchone()
+        if row:
+            raise UserError(_("The pagare number %d is already used by another payment of the journal %s. "
+                              "The next free number is %d.") % (row[0], self.name, self.pagare_last_number + 1))
+
+    @api.model
+    def _get_matured_pagare_lines(self, date):
+        """ Return the open lines of the received pagares on their journal inbound bridge account
+            which mature on or before date, as {(journal id, maturity date, currency id): line ids}.
+        """
+        self.env.cr.execute("""
+            SELECT payment.journal_id, line.date_maturity, line.currency_id, line.id
+              FROM account_move_line line
+              JOIN account_payment payment ON payment.id = line.payment_id
+              JOIN account_journal journal ON journal.id = payment.journal_id
+              JOIN account_account account ON account.id = line.account_id
+             WHERE line.account_id = journal.pagare_inbound_bridge_account_id
+               AND line.date_maturity <= %s
+               AND line.reconciled IS NOT TRUE
+               AND line.payment_id IS NOT NULL
+               AND line.amount_residual != 0
+               AND account.reconcile
+               AND payment.pagare_direction = 'inbound'
+               AND journal.default_debit_account_id IS NOT NULL
+          ORDER BY payment.journal_id, line.date_maturity, line.currency_id, line.id
+        """, (date,))
+        groups = {}
+        for journal_id, date_maturity, currency_id, line_id in self.env.cr.fetchall():
+            groups.setdefault((journal_id, fields.Date.to_string(date_maturity), currency_id), []).append(line_id)
+        return groups
+
+    @api.multi
+    def _collect_matured_pagares(self, date, lines):
+        """ Move the residual amount of the received pagares lines from the inbound bridge account
+            to the bank account of the journal with one move dated on their maturity, and reconcile
+            the lines of each partner with their counterparts.
+        """
+        self.ensure_one()
+        move_lines = []
+        for line in lines:
+            move_lines.append((0, 0, {
+                'name': line.name,
+                'partner_id': line.partner_id.id,
+                'account_id': line.account_id.id,
+                'debit': max(-line.amount_residual, 0.0),
+                'credit': max(line.amount_residual, 0.0),
+                'amount_currency': line.currency_id and -line.amount_residual_currency or 0.0,
+                'currency_id': line.currency_id.id,
+                'date_maturity': date,
+            }))
+        total = sum(lines.mapped('amount_residual'))
+        move_lines.append((0, 0, {
+            'name': _('Matured pagares'),
+            'account_id': self.default_debit_account_id.id,
+            'debit': max(total, 0.0),
+            'credit': max(-total, 0.0),
+            'amount_currency': lines[0].currency_id and sum(lines.mapped('amount_residual_currency')) or 0.0,
+            'currency_id': lines[0].currency_id.id,
+            'date_maturity': date,
+        }))
+        move = self.env['account.move'].create({
+            'journal_id': self.id,
+            'date': date,
+            'ref': _('Matured pagares'),
+            'company_id': self.company_id.id,
+            'line_ids': move_lines,
+        })
+        move.post()
+        # The counterparts are created in the order of the lines
+        bridge_lines = move.line_ids.filtered(lambda l: l.account_id == lines[0].account_id).sorted('id')
+        partner_line_ids = {}
+        for line, bridge_line in zip(lines, bridge_lines):
+            partner_line_ids.setdefault(line.partner_id.id, []).extend([line.id, bridge_line.id])
+        for line_ids in partner_line_ids.values():
+            self.env['account.move.line'].browse(line_ids).reconcile()
+        return move
+
+    @api.model
+    def _cron_collect_matured_pagares(self, date=None, batch_size=None):
+        """ Collect the received pagares matured on or before date (today by default), in batches
+            of batch_size lines of the same journal, maturity date and currency. Each batch is
+            committed, the lines of an interrupted run are collected by the next one. A failing
+            batch is logged and skipped, without preventing the collection of the others.
+        """
+        date = date or fields.Date.context_today(self)
+        batch_size = batch_size or int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_pagare_printing.maturity_batch_size', 500))
+        testing = getattr(threading.currentThread(), 'testing', False)
+        moves = self.env['account.move']
+        for (journal_id, date_maturity, currency_id), line_ids in self._get_matured_pagare_lines(date).items():
+            journal = self.browse(journal_id)
+            for index in range(0, len(line_ids), batch_size):
+                lines = self.env['account.move.line'].browse(line_ids[index:index + batch_size])
+                try:
+                    with self.env.cr.savepoint():
+                        moves += journal._collect_matured_pagares(date_maturity, lines)
+                except Exception:
+                    _logger.exception("Could not collect the %d matured pagares of the journal %s on %s",
+                                      len(lines), journal.name, date_maturity)
+                    self.env.invalidate_all()
+                    continue
+                if not testing:
+                    self.env.cr.commit()
+                    self.env.invalidate_all()
+        return moves
+
     def _default_outbound_payment_methods(self):
         methods = super(AccountJournal, self)._default_outbound_payment_methods()
         return methods + self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare')
@@ -101,32 +377,137 @@ class AccountJournal(models.Model):
         methods = super(AccountJournal, self)._default_inbound_payment_methods()
         return methods + self.env.ref('account_pagare_printing.account_payment_method_inbound_pagare')
 
+    @api.multi
+    def _create_pagare_sequences(self):
+        """ Create the pagare sequences of the journals which do not have one yet, with a fixed
+            number of statements whatever the number of journals.
+        """
+        self.env.cr.execute("""
+            SELECT id, nextval('ir_sequence_id_seq'), name, company_id
+              FROM account_journal
+             WHERE id IN %s AND pagare_sequence_id IS NULL
+        """, (tuple(self.ids) or (0,),))
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return
+        journal_ids, sequence_ids, names, company_ids = [list(column) for column in zip(*rows)]
+        names = [name + _(": Pagare Number Sequence") for name in names]
+        # Gapless sequences are plain rows, contrary to the standard ones they need no postgres sequence
+        self.env.cr.execute("""
+            INSERT INTO ir_sequence (id, name, implementation, padding, number_increment, number_next,
+                                     company_id, active, use_date_range,
+                                     create_uid, create_date, write_uid, write_date)
+            SELECT vals.id, vals.name, 'no_gap', 5, 1, 1, vals.company_id, TRUE, FALSE,
+                   %s, (now() at time zone 'UTC'), %s, (now() at time zone 'UTC')
+              FROM unnest(%s::int[], %s::varchar[], %s::int[]) AS vals(id, name, company_id)
+        """, (self.env.uid, self.env.uid, sequence_ids, names, company_ids))
+        self.env.cr.execute("""
+            UPDATE account_journal journal
+               SET pagare_sequence_id = vals.sequence_id
+              FROM unnest(%s::int[], %s::int[]) AS vals(id, sequence_id)
+             WHERE journal.id = vals.id
+        """, (journal_ids, sequence_ids))
+        self.invalidate_cache(['pagare_sequence_id', 'pagare_next_number'], journal_ids)
+
+    def _get_pagare_payment_method_relations(self):
+        """ Return the (relation table, journal column, method column, method) of the pagare methods """
+        relations = []
+        for fname, xmlid in (
+                ('outbound_payment_method_ids', 'account_pagare_printing.account_payment_method_outbound_pagare'),
+                ('inbound_payment_method_ids', 'account_pagare_printing.account_payment_method_inbound_pagare')):
+            field = self._fields[fname]
+            relations.append((field.relation, field.column1, field.column2, self.env.ref(xmlid)))
+        return relations
+
+    @api.multi
+    def _add_pagare_payment_methods(self):
+        """ Attach the pagare payment methods to the journals that do not have them yet """
+        for relation, journal_column, method_column, method in self._get_pagare_payment_method_relations():
+            self.env.cr.execute("""
+                INSERT INTO {relation} ({journal_column}, {method_column})
+                SELECT journal.id, %s
+                  FROM account_journal journal
+                 WHERE journal.id IN %s
+                   AND NOT EXISTS (SELECT 1 FROM {relation} rel
+                                    WHERE rel.{journal_column} = journal.id AND rel.{method_column} = %s)
+            """.format(relation=relation, journal_column=journal_column, method_column=method_column),
+                (method.id, tuple(self.ids) or (0,), method.id))
+        self.invalidate_cache(['outbound_payment_method_ids', 'inbound_payment_method_ids'], self.ids)
+        self._update_pagare_method_flags(self.ids)
+
+    @api.multi
+    def _remove_pagare_payment_methods(self):
+        for relation, journal_column, method_column, method in self._get_pagare_payment_method_relations():
+            self.env.cr.execute("""
+                DELETE FROM {relation} WHERE {journal_column} IN %s AND {method_column} = %s
+            """.format(relation=relation, journal_column=journal_column, method_column=method_column),
+                (tuple(self.ids) or (0,), method.id))
+        self.invalidate_cache(['outbound_payment_method_ids', 'inbound_payment_method_ids'], self.ids)
+        self._update_pagare_method_flags(self.ids)
+
     @api.model
     def _enable_pagare_printing_on_bank_journals(self):
         """ Enables pagare printing payment method and add a pagare sequence on bank journals.
-            Called upon module installation via data file.
+            Called upon module installation and update via data file: the journals already
+            configured are skipped, and the others are configured in a few set-based statements.
         """
-        pagare_outbound_printing = self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare')
-        pagare_inbound_printing = self.env.ref('account_pagare_printing.account_payment_method_inbound_pagare')
-        bank_journals = self.search([('type', '=', 'bank')])
-        for bank_journal in bank_journals:
-            bank_journal._create_pagare_sequence()
-            bank_journal.write({
-                'outbound_payment_method_ids': [(4, pagare_outbound_printing.id, None)],
-                'inbound_payment_method_ids': [(4, pagare_inbound_printing.id, None)],
-            })
+        # A journal with a pagare sequence is configured, its payment methods may have been changed since
+        bank_journals = self.with_context(active_test=False).search([
+            ('type', '=', 'bank'),
+            ('pagare_sequence_id', '=', False),
+        ])
+        bank_journals._create_pagare_sequences()
+        bank_journals._add_pagare_payment_methods()
+
+    @api.multi
+    def _get_pagare_dashboard_datas(self):
+        """ Compute the pagare counters of all the journals with one grouped query.
+            Amounts are converted to the journal currency.
+        """
+        datas = {journal.id: {'num_to_print': 0, 'sum_to_print': 0.0, 'num_overdue': 0} for journal in self}
+        pagare_journals = self.filtered(lambda j: j.id and (j.pagare_printing_outbound_payment_method_selected or
+                                                            j.pagare_printing_inbound_payment_method_selected))
+        if not pagare_journals:
+            return datas
+        self.env.cr.execute("""
+            SELECT journal_id, currency_id,
+                   SUM(CASE WHEN payment_type = 'outbound' THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN payment_type = 'outbound' THEN amount ELSE 0 END),
+                   SUM(CASE WHEN payment_type = 'inbound' AND pagare_due_date < %s THEN 1 ELSE 0 END)
+              FROM account_payment
+             WHERE journal_id IN %s
+               AND pagare_direction IS NOT NULL
+               AND state = 'posted'
+          GROUP BY journal_id, currency_id
+        """, (fields.Date.context_today(self), tuple(pagare_journals.ids)))
+        for journal_id, currency_id, num_to_print, sum_to_print, num_overdue in self.env.cr.fetchall():
+            journal = self.browse(journal_id)
+            journal_currency = journal.currency_id or journal.company_id.currency_id
+            if currency_id and currency_id != journal_currency.id:
+                sum_to_print = self.env['res.currency'].browse(currency_id).compute(sum_to_print, journal_currency)
+            datas[journal_id]['num_to_print'] += num_to_print
+            datas[journal_id]['sum_to_print'] += sum_to_print
+            datas[journal_id]['num_overdue'] += num_overdue
+        return datas
+
+    @api.multi
+    def _compute_pagare_dashboard_datas(self):
+        # The dashboard reads the journals together, so the counters of all of them are computed at once
+        datas = self._get_pagare_dashboard_datas()
+        for journal in self:
+            journal.pagare_num_to_print = datas[journal.id]['num_to_print']
+            journal.pagare_sum_to_print = datas[journal.id]['sum_to_print']
+            journal.pagare_num_overdue = datas[journal.id]['num_overdue']
 
     @api.multi
     def get_journal_dashboard_datas(self):
-        domain_pagares_to_print = [
-            ('journal_id', '=', self.id),
-            ('payment_type', '=', 'outbound'),
-            ('payment_method_id.code', '=', 'pagare_printing'),
-            ('state', '=', 'posted')
-        ]
+        currency = self.currency_id or self.company_id.currency_id
         return dict(
             super(AccountJournal, self).get_journal_dashboard_datas(),
-            num_pagares_to_print=len(self.env['account.payment'].search(domain_pagares_to_print))
+            num_pagares_to_print=self.pagare_num_to_print,
+            sum_pagares_to_print=formatLang(self.env, currency.round(self.pagare_sum_to_print) + 0.0,
+                                            currency_obj=currency),
+            num_pagares_overdue=self.pagare_num_overdue,
         )
 
     @api.multi
@@ -145,3 +526,25 @@ class AccountJournal(models.Model):
                 default_payment_method_id=self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare').id,
             ),
         }
+
+    @api.multi
+    def action_pagares_overdue(self):
+        return {
+            'name': _('Received Pagares Past Due'),
+            'type': 'ir.actions.act_window',
+            'view_mode': 'list,form,graph',
+            'res_model': 'account.payment',
+            'domain': [
+                ('journal_id', '=', self.id),
+                ('payment_type', '=', 'inbound'),
+                ('pagare_direction', '!=', False),
+                ('state', '=', 'posted'),
+                ('pagare_due_date', '<', fields.Date.context_today(self)),
+            ],
+            'context': dict(
+                self.env.context,
+                journal_id=self.id,
+                default_journal_id=self.id,
+                default_payment_type='inbound',
+            ),
+        }
@@ -0,0 +1,20 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+from odoo.tools.sql import index_exists
+
+
+class AccountMoveLine(models.Model):
+    _inherit = "account.move.line"
+
+    @api.model_cr_context
+    def init(self):
+        # Serves the search of the received pagares to collect, see AccountJournal._collect_matured_pagares()
+        if not index_exists(self.env.cr, 'account_move_line_pagare_maturity_index'):
+            self.env.cr.execute("""
+                CREATE INDEX account_move_line_pagare_maturity_index
+                    ON account_move_line (account_id, date_maturity)
+                 WHERE reconciled IS NOT TRUE AND payment_id IS NOT NULL
+            """)
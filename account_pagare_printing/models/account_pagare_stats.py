@@ -0,0 +1,77 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import functools
+import time
+from contextlib import contextmanager
+
+from odoo import api, fields, models
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def measure_stage(stage, get_records=None):
+    """ Decorate a method of the pagare flow to record its measures as stage, see
+        AccountPagareStats.measure(). The measures are tagged with the records of the call,
+        or with the ones returned by get_records(self, *args, **kwargs).
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            records = get_records(self, *args, **kwargs) if get_records else self
+            with self.env['account.pagare.stats'].measure(stage, records):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class AccountPagareStats(models.Model):
+    """ Wall time and number of SQL queries of the stages of the pagare flow. They are only
+        recorded when the system parameter account_pagare_printing.stats_enabled is set.
+    """
+    _name = 'account.pagare.stats'
+    _description = 'Pagare Performance Measure'
+    _order = 'id desc'
+
+    stage = fields.Char(string='Stage', required=True, readonly=True, index=True)
+    journal_id = fields.Many2one(comodel_name='account.journal', string='Journal', readonly=True)
+    user_id = fields.Many2one(comodel_name='res.users', string='User', readonly=True)
+    batch_size = fields.Integer(string='Batch Size', readonly=True, group_operator='avg')
+    duration = fields.Float(string='Duration (s)', digits=(16, 3), readonly=True)
+    query_count = fields.Integer(string='Queries', readonly=True)
+    row_count = fields.Integer(string='Rows', readonly=True)
+
+    def _is_enabled(self):
+        # get_param() is cached, checking it does not run any query
+        return bool(self.env['ir.config_parameter'].sudo().get_param('account_pagare_printing.stats_enabled'))
+
+    @api.model
+    @contextmanager
+    def measure(self, stage, records=None):
+        """ Measure the block and record it under stage, tagged with the journal and the number
+            of the records. The block may set the number of processed rows in the yielded dict.
+        """
+        if not self._is_enabled():
+            yield {}
+            return
+        cr = self.env.cr
+        measure = {'rows': len(records) if records is not None else 0}
+        queries = cr.sql_log_count
+        start = time.time()
+        yield measure
+        duration = time.time() - start
+        queries = cr.sql_log_count - queries
+        journal = records[:1].journal_id if records is not None and 'journal_id' in records._fields else None
+        _logger.debug("Pagare stage %s: %d records, %.3fs, %d queries", stage, measure['rows'], duration, queries)
+        self.sudo().create({
+            'stage': stage,
+            'journal_id': journal and journal.id,
+            'user_id': self.env.uid,
+            'batch_size': len(records) if records is not None else 0,
+            'duration': duration,
+            'query_count': queries,
+            'row_count': measure['rows'],
+        })
@@ -2,8 +2,14 @@
 # @author Jose F. Fernandez
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+from collections import OrderedDict
+
 from odoo import models, fields, api, _
+from odoo.addons.account.models.account_payment import MAP_INVOICE_TYPE_PARTNER_TYPE
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools.sql import column_exists, create_column, index_exists
+
+from .account_pagare_stats import measure_stage
 
 import logging
 
@@ -26,35 +32,52 @@ class AccountRegisterPayments(models.TransientModel):
     def _onchange_journal_id(self):
         if hasattr(super(AccountRegisterPayments, self), '_onchange_journal_id'):
             super(AccountRegisterPayments, self)._onchange_journal_id()
-        if self.payment_method_id == self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare') \
-                and self.journal_id.pagare_manual_sequencing:
+        if self._get_pagare_direction() == 'outbound' and self.journal_id.pagare_manual_sequencing:
             self.pagare_number = self.journal_id.pagare_sequence_id.number_next_actual
 
     @api.onchange('amount')
     def _onchange_amount(self):
         if hasattr(super(AccountRegisterPayments, self), '_onchange_amount'):
             super(AccountRegisterPayments, self)._onchange_amount()
-        if self.payment_method_id == self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare'):
-            self.pagare_amount_in_words = self.currency_id.amount_to_text(self.amount)
+        if self._get_pagare_direction() == 'outbound':
+            self.pagare_amount_in_words = self.env['account.pagare.amount.words'].amount_to_words(
+                self.currency_id, self.amount)
+
+    def _get_pagare_direction(self):
+        return self.env['account.payment.method']._get_pagare_direction(self.payment_method_id.id)
 
     def _compute_pagare_due_date(self, invoices):
-        date_due = False
-        for invoice in invoices:
-            if not date_due:
-                date_due = invoice.date_due
-            elif invoice.date_due < date_due:
-                date_due = invoice.date_due
-        return date_due
+        # In multi mode, the due dates of all the partner groups are resolved by get_payments_vals
+        due_dates = self.env.context.get('pagare_due_dates')
+        if due_dates and invoices:
+            key = (invoices[0].commercial_partner_id.id, MAP_INVOICE_TYPE_PARTNER_TYPE[invoices[0].type])
+            if key in due_dates:
+                return due_dates[key]
+        return invoices._get_pagare_due_date()
+
+    @api.multi
+    def get_payments_vals(self):
+        if self.multi and self._get_pagare_direction() and not self.pagare_due_date:
+            self = self.with_context(pagare_due_dates=self.invoice_ids._get_pagare_due_dates())
+        payments_vals = super(AccountRegisterPayments, self).get_payments_vals()
+        if self.multi and self._get_pagare_direction() == 'outbound' and self.journal_id.pagare_manual_sequencing:
+            # Reserve the numbers of all the pagares at once instead of one locked update per payment
+            numbers = self.journal_id._reserve_pagare_numbers(len(payments_vals))
+            for vals, number in zip(payments_vals, numbers):
+                vals['pagare_number'] = number
+        return payments_vals
 
     @api.onchange('payment_method_id')
     def _onchange_payment_method_id(self):
-        if self.payment_method_id.code == 'pagare_printing' and not self.multi:
+        pagare_direction = self._get_pagare_direction()
+        if pagare_direction and not self.multi:
             active_ids = self._context.get('active_ids')
             invoices = self.env['account.invoice'].browse(active_ids)
             self.pagare_due_date = self._compute_pagare_due_date(invoices)
-            if self.payment_method_id == self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare'):
-                self.pagare_amount_in_words = self.currency_id.amount_to_text(self.amount)
-        if self.payment_method_id.code == 'pagare_printing' and self.payment_method_id.payment_type == 'inbound':
+            if pagare_direction == 'outbound':
+                self.pagare_amount_in_words = self.env['account.pagare.amount.words'].amount_to_words(
+                    self.currency_id, self.amount)
+        if pagare_direction == 'inbound':
             self.communication = False
 
     def _prepare_payment_vals(self, invoices):
@@ -62,9 +85,10 @@ class AccountRegisterPayments(models.TransientModel):
         res.update({
             'pagare_due_date': self.pagare_due_date or self._compute_pagare_due_date(invoices),
         })
-        if self.payment_method_id == self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare'):
+        if self._get_pagare_direction() == 'outbound':
             res.update({
-                'pagare_amount_in_words': self.currency_id.amount_to_text(res['amount']) if self.multi else self.pagare_amount_in_words,
+                'pagare_amount_in_words': self.env['account.pagare.amount.words'].amount_to_words(
+                    self.currency_id, res['amount']) if self.multi else self.pagare_amount_in_words,
             })
         return res
 
@@ -80,66 +104,122 @@ class AccountPayment(models.Model):
                                         "If your pre-printed pagare paper already has numbers "
                                         "or if the current numbering is wrong, you can change it in "
                                         "the journal configuration page.")
+    pagare_direction = fields.Selection([('outbound', 'Emitted'), ('inbound', 'Received')], string='Pagare',
+                                        compute='_compute_pagare_direction', store=True, index=True, readonly=True,
+                                        help="Technical field used to find pagare payments without joining "
+                                             "on their payment method.")
+
+    @api.model_cr_context
+    def _auto_init(self):
+        # Create and fill the column in SQL, so that the ORM does not compute it record by record
+        if not column_exists(self.env.cr, self._table, 'pagare_direction'):
+            create_column(self.env.cr, self._table, 'pagare_direction', 'varchar')
+            self.env.cr.execute("""
+                UPDATE account_payment payment
+                   SET pagare_direction = method.payment_type
+                  FROM account_payment_method method
+                 WHERE method.id = payment.payment_method_id
+                   AND method.code = 'pagare_printing'
+            """)
+        return super(AccountPayment, self)._auto_init()
+
+    @api.model_cr_context
+    def init(self):
+        # Guarantee that a pagare number is not used twice in the same journal. This index also
+        # serves the lookups of numbers by journal.
+        if not index_exists(self.env.cr, 'account_payment_journal_pagare_number_uniq'):
+            self.env.cr.execute("""
+                SELECT journal.name, payment.pagare_number, array_agg(payment.id ORDER BY payment.id)
+                  FROM account_payment payment
+                  JOIN account_journal journal ON journal.id = payment.journal_id
+                 WHERE payment.pagare_number != 0
+              GROUP BY journal.name, payment.journal_id, payment.pagare_number
+                HAVING COUNT(*) > 1
+              ORDER BY journal.name, payment.pagare_number
+            """)
+            duplicates = self.env.cr.fetchall()
+            if duplicates:
+                _logger.error(
+                    "The pagare numbers are not protected against duplicates: the unique index "
+                    "account_payment_journal_pagare_number_uniq will be created on the next update of the "
+                    "module once these numbers are fixed (journal, number, payment ids):\n%s",
+                    '\n'.join('%s, %d, %s' % duplicate for duplicate in duplicates))
+            else:
+                self.env.cr.execute("""
+                    CREATE UNIQUE INDEX account_payment_journal_pagare_number_uniq
+                        ON account_payment (journal_id, pagare_number)
+                     WHERE pagare_number != 0
+                """)
+
+    @api.depends('payment_method_id')
+    def _compute_pagare_direction(self):
+        directions = self.env['account.payment.method']._get_pagare_method_directions()
+        for rec in self:
+            rec.pagare_direction = directions.get(rec.payment_method_id.id, False)
 
     @api.onchange('journal_id')
     def _onchange_journal_id(self):
         if hasattr(super(AccountPayment, self), '_onchange_journal_id'):
             super(AccountPayment, self)._onchange_journal_id()
-        if self.payment_method_id == self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare') \
-                and self.journal_id.pagare_manual_sequencing:
+        if self.pagare_direction == 'outbound' and self.journal_id.pagare_manual_sequencing:
             self.pagare_number = self.journal_id.pagare_sequence_id.number_next_actual
 
     @api.onchange('amount', 'currency_id')
     def _onchange_amount(self):
         res = super(AccountPayment, self)._onchange_amount()
-        if self.payment_method_id == self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare'):
-            self.pagare_amount_in_words = self.currency_id.amount_to_text(self.amount) if self.currency_id else ''
+        if self.pagare_direction == 'outbound':
+            self.pagare_amount_in_words = self.env['account.pagare.amount.words'].amount_to_words(
+                self.currency_id, self.amount)
         return res
 
     @api.onchange('payment_method_id')
     def _onchange_payment_method_id(self):
-        if self.payment_method_id.code == 'pagare_printing':
-            date_due = False
-            for invoice in self.invoice_ids:
-                if not date_due:
-                    date_due = invoice.date_due
-                elif invoice.date_due < date_due:
-                    date_due = invoice.date_due
-            self.pagare_due_date = date_due
-            if self.payment_method_id == self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare'):
-                self.pagare_amount_in_words = self.currency_id.amount_to_text(self.amount)
-        if self.payment_method_id.code == 'pagare_printing' and self.payment_method_id.payment_type == 'inbound':
+        if self.pagare_direction:
+            self.pagare_due_date = self.invoice_ids._get_pagare_due_date()
+            if self.pagare_direction == 'outbound':
+                self.pagare_amount_in_words = self.env['account.pagare.amount.words'].amount_to_words(
+                    self.currency_id, self.amount)
+        if self.pagare_direction == 'inbound':
             self.communication = False
 
     @api.model
     def create(self, vals):
-        if vals['payment_method_id'] == self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare').id:
+        if self.env['account.payment.method']._get_pagare_direction(vals['payment_method_id']) == 'outbound':
             journal = self.env['account.journal'].browse(vals['journal_id'])
-            if journal.pagare_manual_sequencing:
-                vals.update({'pagare_number': journal.pagare_sequence_id.next_by_id()})
-        return super(AccountPayment, self).create(vals)
+            # The number may have been reserved with the rest of a batch, see _reserve_pagare_numbers()
+            if journal.pagare_manual_sequencing and not vals.get('pagare_number'):
+                vals.update({'pagare_number': journal._reserve_pagare_numbers(1)[0]})
+        rec = super(AccountPayment, self).create(vals)
+        if rec.pagare_number:
+            self.env['account.journal']._update_pagare_last_numbers({rec.journal_id.id: rec.pagare_number})
+        return rec
+
+    @api.multi
+    def write(self, vals):
+        res = super(AccountPayment, self).write(vals)
+        if vals.get('pagare_number') or (vals.get('journal_id') and any(rec.pagare_number for rec in self)):
+            last_numbers = {}
+            for rec in self:
+                last_numbers[rec.journal_id.id] = max(last_numbers.get(rec.journal_id.id, 0), rec.pagare_number)
+            self.env['account.journal']._update_pagare_last_numbers(last_numbers)
+        return res
 
     @api.multi
+    @measure_stage('print_pagares')
     def print_pagares(self):
         """ Check that the recordset is valid, set the payments state to sent and call print_pagares() """
         # Since this method can be called via a client_action_multi, we need to make sure the received records are what we expect
-        self = self.filtered(lambda r: r.payment_method_id.code == 'pagare_printing' and
+        self = self.filtered(lambda r: r.pagare_direction and
                                        r.payment_type == 'outbound' and
                                        r.state != 'reconciled')
 
         if len(self) == 0:
             raise UserError(_("Payments to print as a pagare must have 'Emitted Pagare' selected as payment method and "
                               "not have already been reconciled"))
-        if any(payment.journal_id != self[0].journal_id for payment in self):
-            raise UserError(_("In order to print multiple pagares at once, they must belong to the same bank journal."))
-
-        if not self[0].journal_id.pagare_manual_sequencing:
-            # The wizard asks for the number printed on the first pre-printed pagare
+        prenumbered_journals = self.mapped('journal_id').filtered(lambda j: not j.pagare_manual_sequencing)
+        if prenumbered_journals:
+            # The wizard asks for the number printed on the first pre-printed pagare of each journal
             # so payments are attributed the number of the pagare the'll be printed on.
-            last_printed_pagare = self.search([
-                ('journal_id', '=', self[0].journal_id.id),
-                ('pagare_number', '!=', 0)], order="pagare_number desc", limit=1)
-            next_pagare_number = last_printed_pagare and last_printed_pagare.pagare_number + 1 or 1
             return {
                 'name': _('Print Pre-numbered Pagares'),
                 'type': 'ir.actions.act_window',
@@ -149,7 +229,11 @@ class AccountPayment(models.Model):
                 'target': 'new',
                 'context': {
                     'payment_ids': self.ids,
-                    'default_next_pagare_number': next_pagare_number,
+                    'default_line_ids': [(0, 0, {
+                        'journal_id': journal.id,
+                        'next_pagare_number': journal.pagare_last_number + 1,
+                        'payment_count': len(self.filtered(lambda r: r.journal_id == journal)),
+                    }) for journal in prenumbered_journals],
                 }
             }
         else:
@@ -157,38 +241,101 @@ class AccountPayment(models.Model):
             return self.do_print_pagares()
 
     def set_pagare_number_from_printing(self, pagare_number):
-        self.pagare_number = pagare_number
-        account_id = self.payment_type in (
-            'outbound', 'transfer'
-        ) and self.journal_id.default_debit_account_id or self.journal_id.default_credit_account_id
-        if self.payment_type == 'outbound':
-            self.name = _('Emitted pagare: %d') % pagare_number
-            account_id = self.journal_id.pagare_outbound_bridge_account_id or account_id
-            self.move_line_ids.filtered(lambda m: m.account_id == account_id).name = self.name
+        self._set_pagare_numbers_from_printing(pagare_number)
+
+    @api.multi
+    def _set_pagare_numbers_from_printing(self, first_number):
+        """ Number the payments consecutively from first_number, following the order of the
+            recordset, and rename the emitted pagares and their liquidity (or bridge) move lines.
+
+            The whole batch is updated with a fixed number of statements.
+        """
+        if not self:
+            return
+        numbers = list(range(first_number, first_number + len(self)))
+        names = [_('Emitted pagare: %d') % number if payment.payment_type == 'outbound' else None
+                 for payment, number in zip(self, numbers)]
+        # Free the numbers of the batch first, a reprint may give them to other payments of the batch
+        self.env.cr.execute("""
+            UPDATE account_payment SET pagare_number = 0 WHERE id IN %s AND pagare_number != 0
+        """, (tuple(self.ids),))
+        self.env.cr.execute("""
+            UPDATE account_payment payment
+               SET pagare_number = vals.number,
+                   name = COALESCE(vals.name, payment.name),
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM unnest(%s::int[], %s::int[], %s::varchar[]) AS vals(id, number, name)
+             WHERE payment.id = vals.id
+        """, (self.env.uid, self.ids, numbers, names))
+        self.env.cr.execute("""
+            UPDATE account_move_line line
+               SET name = payment.name,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM account_payment payment
+              JOIN account_journal journal ON journal.id = payment.journal_id
+             WHERE line.payment_id = payment.id
+               AND payment.id IN %s
+               AND payment.payment_type = 'outbound'
+               AND line.account_id = COALESCE(journal.pagare_outbound_bridge_account_id,
+                                              journal.default_debit_account_id,
+                                              journal.default_credit_account_id)
+         RETURNING line.id
+        """, (self.env.uid, tuple(self.ids)))
+        line_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_cache(['pagare_number', 'name', 'write_uid', 'write_date'], self.ids)
+        self.env['account.move.line'].invalidate_cache(['name', 'write_uid', 'write_date'], line_ids)
+        last_numbers = {}
+        for payment, number in zip(self, numbers):
+            last_numbers[payment.journal_id.id] = max(last_numbers.get(payment.journal_id.id, 0), number)
+        self.env['account.journal']._update_pagare_last_numbers(last_numbers)
 
     @api.multi
     def unmark_sent(self):
         self.write({'state': 'posted'})
 
     @api.multi
-    def do_print_pagares(self):
+    def _get_pagare_print_groups(self):
+        """ Group the payments by the report of their journal layout.
+            Return a list of (report name, payments), in the order the layouts appear in the
+            recordset. The payments of a group follow the physical paper order, which is the
+            order of the journals and of the pagare numbers, so that the pagares of journals
+            sharing a layout are not interleaved.
+        """
+        groups = OrderedDict()
         for rec in self:
-            if rec.journal_id.pagare_layout_id:
-                return self.env['ir.actions.report']._get_report_from_name(
-                    rec.journal_id.pagare_layout_id.report
-                ).report_action(self)
-        raise UserError(_("There is no pagare layout configured.\nMake sure the proper pagare printing module is "
-                          "installed and its configuration in the bank journal is correct."))
+            groups.setdefault(rec.journal_id.pagare_layout_id.report, []).append(rec)
+        return [(report_name, self.browse([rec.id for rec in sorted(
+            recs, key=lambda r: (r.journal_id.id, r.pagare_number, r.id))]))
+            for report_name, recs in groups.items()]
+
+    @api.multi
+    @measure_stage('do_print_pagares')
+    def do_print_pagares(self):
+        if not self or not all(self.mapped('journal_id.pagare_layout_id')):
+            raise UserError(_("There is no pagare layout configured.\nMake sure the proper pagare printing module is "
+                              "installed and its configuration in the bank journal is correct."))
+        groups = self._get_pagare_print_groups()
+        chunk_sizes = [size for size in self.mapped('journal_id.pagare_print_chunk_size') if size]
+        chunk_size = min(chunk_sizes) if chunk_sizes else 0
+        if len(groups) == 1 and (not chunk_size or len(self) <= chunk_size):
+            report_name, payments = groups[0]
+            return self.env['ir.actions.report']._get_report_from_name(report_name).report_action(payments)
+        # Several layouts or more pagares than a chunk: the job renders them in the background
+        # and merges them in a single document
+        job = self.env['account.payment.pagare.print.job'].create_from_payments(self, chunk_size or len(self))
+        return job.action_open()
 
     def _get_move_vals(self, journal=None):
-        if self.payment_method_id.code == 'pagare_printing':
+        if self.pagare_direction:
             if self.payment_type == 'inbound' and self.journal_id.pagare_inbound_journal_id:
                 return super(AccountPayment, self)._get_move_vals(self.journal_id.pagare_inbound_journal_id)
         return super(AccountPayment, self)._get_move_vals(journal)
 
     def _get_counterpart_move_line_vals(self, invoice=None):
         vals = super(AccountPayment, self)._get_counterpart_move_line_vals(invoice)
-        if self.payment_method_id.code == 'pagare_printing':
+        if self.pagare_direction:
             vals['date_maturity'] = self.pagare_due_date
             if self.payment_type == 'inbound' and self.journal_id.pagare_inbound_journal_id:
                 vals['journal_id'] = self.journal_id.pagare_inbound_journal_id.id
@@ -196,7 +343,7 @@ class AccountPayment(models.Model):
 
     def _get_liquidity_move_line_vals(self, amount):
         vals = super(AccountPayment, self)._get_liquidity_move_line_vals(amount)
-        if self.payment_method_id.code == 'pagare_printing':
+        if self.pagare_direction:
             vals['date_maturity'] = self.pagare_due_date
             if self.payment_type == 'outbound':
                 vals['name'] = _('Emitted pagare: %d') % self.pagare_number
@@ -210,19 +357,61 @@ class AccountPayment(models.Model):
                     vals['journal_id'] = self.journal_id.pagare_inbound_journal_id.id
         return vals
 
+    def _get_payments_error_list(self):
+        return '\n'.join('- %s' % (payment.name or '%s (%s %s)' % (
+            payment.partner_id.display_name or '', payment.amount, payment.currency_id.name)) for payment in self)
+
+    @api.multi
+    def _check_pagare_post(self):
+        """ Check that all the payments are drafts and their invoices are open, with one query """
+        if not self:
+            return
+        self.env.cr.execute("""
+            SELECT payment.id, payment.state != 'draft', BOOL_OR(invoice.state != 'open')
+              FROM account_payment payment
+         LEFT JOIN account_invoice_payment_rel rel ON rel.payment_id = payment.id
+         LEFT JOIN account_invoice invoice ON invoice.id = rel.invoice_id
+             WHERE payment.id IN %s
+          GROUP BY payment.id, payment.state
+            HAVING payment.state != 'draft' OR BOOL_OR(invoice.state != 'open')
+        """, (tuple(self.ids),))
+        not_draft_ids, not_open_ids = [], []
+        for payment_id, not_draft, invoice_not_open in self.env.cr.fetchall():
+            if not_draft:
+                not_draft_ids.append(payment_id)
+            elif invoice_not_open:
+                not_open_ids.append(payment_id)
+        if not_draft_ids:
+            raise UserError(_("Only a draft payment can be posted.") + '\n' +
+                            self.browse(not_draft_ids)._get_payments_error_list())
+        if not_open_ids:
+            raise ValidationError(_("The payment cannot be processed because the invoice is not open!") + '\n' +
+                                  self.browse(not_open_ids)._get_payments_error_list())
+
     @api.multi
+    def _set_pagare_names(self):
+        """ Name the emitted and received pagares with a single statement """
+        payments = self.filtered(lambda r: r.pagare_direction and r.payment_type in ('outbound', 'inbound'))
+        if not payments:
+            return
+        names = [_('Emitted pagare: %d') % payment.pagare_number if payment.payment_type == 'outbound'
+                 else _('Received pagare: %s') % payment.communication for payment in payments]
+        self.env.cr.execute("""
+            UPDATE account_payment payment
+               SET name = vals.name
+              FROM unnest(%s::int[], %s::varchar[]) AS vals(id, name)
+             WHERE payment.id = vals.id
+        """, (payments.ids, names))
+        payments.invalidate_cache(['name'], payments.ids)
+
+    @api.multi
+    @measure_stage('post')
     def post(self):
-        for rec in self:
-            if rec.state != 'draft':
-                raise UserError(_("Only a draft payment can be posted."))
-            if any(inv.state != 'open' for inv in rec.invoice_ids):
-                raise ValidationError(_("The payment cannot be processed because the invoice is not open!"))
-            # keep the name in case of a payment reset to draft
-            if not rec.name:
-                if rec.payment_method_id.code == 'pagare_printing':
-                    if rec.payment_type == 'outbound':
-                        rec.name = _('Emitted pagare: %d') % rec.pagare_number
-                    elif rec.payment_type == 'inbound':
-                        rec.name = _('Received pagare: %s') % rec.communication
+        self._check_pagare_post()
+        # keep the name in case of a payment reset to draft
+        self.filtered(lambda r: not r.name)._set_pagare_names()
+        self.env['account.pagare.amount.words'].fill_pagare_amount_in_words(self.filtered(
+            lambda r: r.pagare_direction and r.payment_type == 'outbound' and
+            not r.pagare_amount_in_words))
 
         return super(AccountPayment, self).post()
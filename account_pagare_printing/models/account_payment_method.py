@@ -0,0 +1,45 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models, tools
+
+
+class AccountPaymentMethod(models.Model):
+    _inherit = 'account.payment.method'
+
+    @api.model
+    @tools.ormcache()
+    def _get_pagare_method_directions(self):
+        """ Return a dict mapping the id of every pagare payment method to its direction
+            (outbound or inbound). Cached per registry.
+        """
+        methods = self.sudo().search([('code', '=', 'pagare_printing')])
+        return {method.id: method.payment_type for method in methods}
+
+    @api.model
+    def _get_pagare_direction(self, method_id):
+        return self._get_pagare_method_directions().get(method_id, False)
+
+    @api.model
+    def create(self, vals):
+        res = super(AccountPaymentMethod, self).create(vals)
+        if res.code == 'pagare_printing':
+            self.clear_caches()
+        return res
+
+    @api.multi
+    def write(self, vals):
+        pagare_methods = any(method.code == 'pagare_printing' for method in self)
+        res = super(AccountPaymentMethod, self).write(vals)
+        if pagare_methods or vals.get('code') == 'pagare_printing':
+            self.clear_caches()
+        return res
+
+    @api.multi
+    def unlink(self):
+        pagare_methods = any(method.code == 'pagare_printing' for method in self)
+        res = super(AccountPaymentMethod, self).unlink()
+        if pagare_methods:
+            self.clear_caches()
+        return res
@@ -0,0 +1,188 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import odoo
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+from .pdf_tools import merge_pdfs
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def _render_pdf_chunk(dbname, uid, context, report_name, res_ids):
+    """ Render a chunk of pagares with its own cursor, so that several chunks
+        can be rendered (and several wkhtmltopdf processes run) at the same time.
+    """
+    with api.Environment.manage(), odoo.registry(dbname).cursor() as cr:
+        env = api.Environment(cr, uid, context)
+        report = env['ir.actions.report']._get_report_from_name(report_name)
+        return report.render_qweb_pdf(res_ids)[0]
+
+
+class AccountPaymentPagarePrintJob(models.Model):
+    _name = 'account.payment.pagare.print.job'
+    _description = 'Pagare Print Job'
+    _order = 'id desc'
+
+    name = fields.Char(string='Name', required=True, readonly=True)
+    journal_id = fields.Many2one(comodel_name='account.journal', string='Journal', readonly=True)
+    report = fields.Char(string='Report name', readonly=True,
+                         help="Report of the pagares, empty when they are printed with several layouts.")
+    payment_ids = fields.Many2many(comodel_name='account.payment', relation='account_payment_pagare_print_job_rel',
+                                   column1='job_id', column2='payment_id', string='Payments', readonly=True)
+    payment_count = fields.Integer(string='Pagares', compute='_compute_progress')
+    chunk_size = fields.Integer(string='Chunk Size', required=True, readonly=True)
+    chunk_count = fields.Integer(string='Chunks', readonly=True)
+    chunk_done = fields.Integer(string='Rendered Chunks', readonly=True)
+    progress = fields.Float(string='Progress', compute='_compute_progress')
+    state = fields.Selection([('pending', 'Pending'),
+                              ('running', 'Running'),
+                              ('done', 'Done'),
+                              ('failed', 'Failed')], string='Status', default='pending', readonly=True)
+    error = fields.Text(string='Error', readonly=True)
+    attachment_id = fields.Many2one(comodel_name='ir.attachment', string='Printed Pagares', readonly=True)
+
+    @api.depends('payment_ids', 'chunk_count', 'chunk_done')
+    def _compute_progress(self):
+        for job in self:
+            job.payment_count = len(job.payment_ids)
+            job.progress = job.chunk_count and 100.0 * job.chunk_done / job.chunk_count or 0.0
+
+    @api.model
+    def create_from_payments(self, payments, chunk_size):
+        """ Create a print job rendering the given payments in chunks of chunk_size pagares,
+            with the layout of their journal.
+        """
+        journals = payments.mapped('journal_id')
+        reports = journals.mapped('pagare_layout_id.report')
+        return self.create({
+            'name': _('%d pagares of %s') % (len(payments), ', '.join(journals.mapped('name'))),
+            'journal_id': len(journals) == 1 and journals.id,
+            'report': len(reports) == 1 and reports[0],
+            'payment_ids': [(6, 0, payments.ids)],
+            'chunk_size': chunk_size,
+            'chunk_count': sum(-(-len(group) // chunk_size) for report, group in payments._get_pagare_print_groups()),
+        })
+
+    def _get_print_chunks(self):
+        """ Split the payments in chunks of the same layout following the physical paper order,
+            see _get_pagare_print_groups().
+            Return a list of (report name, payment ids).
+        """
+        self.ensure_one()
+        chunks = []
+        for report_name, payments in self.payment_ids._get_pagare_print_groups():
+            chunks += [(report_name, payments[i:i + self.chunk_size].ids)
+                       for i in range(0, len(payments), self.chunk_size)]
+        return chunks
+
+    def _get_print_workers(self):
+        return max(int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_pagare_printing.print_workers', 2)), 1)
+
+    def _commit(self):
+        if not getattr(threading.currentThread(), 'testing', False):
+            self.env.cr.commit()
+
+    @api.multi
+    def run(self):
+        """ Render the pending chunks in a pool of workers and merge them in print order """
+        for job in self:
+            job.write({'state': 'running', 'chunk_done': 0, 'error': False})
+            job._commit()
+            chunks = job._get_print_chunks()
+            try:
+                if getattr(threading.currentThread(), 'testing', False):
+                    # Test data is not visible from other cursors, render in this one
+                    pdfs = [self.env['ir.actions.report']._get_report_from_name(report_name).render_qweb_pdf(chunk)[0]
+                            for report_name, chunk in chunks]
+                else:
+                    pdfs = job._render_chunks(chunks)
+                with self.env.cr.savepoint():
+                    attachment = self.env['ir.attachment'].create({
+                        'name': '%s.pdf' % job.name,
+                        'datas_fname': '%s.pdf' % job.name,
+                        'datas': base64.b64encode(merge_pdfs(pdfs)),
+                        'res_model': self._name,
+                        'res_id': job.id,
+                        'mimetype': 'application/pdf',
+                    })
+                    job.write({'state': 'done', 'chunk_done': len(chunks), 'attachment_id': attachment.id})
+            except Exception as e:
+                _logger.exception("Pagare print job %s failed", job.id)
+                job.write({'state': 'failed', 'error': str(e)})
+            job._commit()
+        return True
+
+    def _render_chunks(self, chunks):
+        self.ensure_one()
+        pdfs = [None] * len(chunks)
+        with ThreadPoolExecutor(max_workers=self._get_print_workers()) as executor:
+            futures = {
+                executor.submit(_render_pdf_chunk, self.env.cr.dbname, self.env.uid, dict(self.env.context),
+                                report_name, chunk): index
+                for index, (report_name, chunk) in enumerate(chunks)
+            }
+            for future in futures:
+                pdfs[futures[future]] = future.result()
+                self.chunk_done += 1
+                self._commit()
+        return pdfs
+
+    def _get_stale_timeout(self):
+        return max(int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_pagare_printing.print_job_timeout', 60)), 1)
+
+    def _get_stale_domain(self):
+        """ Domain of the running jobs not updated for the timeout (in minutes), left running by
+            a worker that crashed or was killed. A running job is updated at each rendered chunk.
+        """
+        limit = fields.Datetime.to_string(datetime.utcnow() - timedelta(minutes=self._get_stale_timeout()))
+        return [('state', '=', 'running'), ('write_date', '<', limit)]
+
+    @api.model
+    def _cron_process_print_jobs(self):
+        stale_jobs = self.search(self._get_stale_domain())
+        if stale_jobs:
+            _logger.warning("Pagare print jobs %s were left running, they are rendered again", stale_jobs.ids)
+            stale_jobs.write({'state': 'pending'})
+        self.search([('state', '=', 'pending')], order='id').run()
+
+    @api.multi
+    def action_retry(self):
+        jobs = self.filtered(lambda j: j.state == 'failed')
+        jobs |= self.search([('id', 'in', self.ids)] + self._get_stale_domain())
+        jobs.write({'state': 'pending', 'error': False})
+
+    @api.multi
+    def action_download(self):
+        self.ensure_one()
+        if not self.attachment_id:
+            raise UserError(_("The pagares of this print job have not been rendered yet."))
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/web/content/%s?download=true' % self.attachment_id.id,
+            'target': 'self',
+        }
+
+    @api.multi
+    def action_open(self):
+        self.ensure_one()
+        return {
+            'name': _('Pagare Print Job'),
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_type': 'form',
+            'view_mode': 'form',
+            'target': 'current',
+        }
@@ -2,7 +2,7 @@
 # @author Jose F. Fernandez
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class AccountPaymentPagareReport(models.Model):
@@ -10,3 +10,10 @@ class AccountPaymentPagareReport(models.Model):
 
     name = fields.Char(string='Name', required=True)
     report = fields.Char(string='Report name', required=True)
+
+    @api.multi
+    def write(self, vals):
+        res = super(AccountPaymentPagareReport, self).write(vals)
+        if 'report' in vals:
+            self.env['account.pagare.pdf.cache'].clear()
+        return res
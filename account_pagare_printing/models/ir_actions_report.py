@@ -0,0 +1,55 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import threading
+
+from odoo import api, models
+
+
+class IrActionsReport(models.Model):
+    _inherit = 'ir.actions.report'
+
+    def _is_pagare_report(self):
+        return self.model == 'account.payment' and bool(
+            self.env['account.payment.pagare.report'].sudo().search_count([('report', '=', self.report_name)]))
+
+    def _render_pagare_documents(self, res_ids, data=None):
+        """ Render the pagares res_ids at once, without the cache """
+        return self.with_context(pagare_pdf_cache=False).render_qweb_pdf(res_ids, data=data)
+
+    def _use_pagare_pdf_cache(self):
+        # The cache is off in the tests, unless they enable it with the pagare_pdf_cache context key
+        testing = getattr(threading.currentThread(), 'testing', False)
+        return self.env.context.get('pagare_pdf_cache', not testing) and \
+            bool(self.env['account.pagare.pdf.cache']._get_max_size())
+
+    @api.multi
+    def render_qweb_pdf(self, res_ids=None, data=None):
+        # Reprints of the pagares reuse the documents which did not change, see account.pagare.pdf.cache
+        if res_ids and self._is_pagare_report() and self._use_pagare_pdf_cache():
+            res_ids = [res_ids] if isinstance(res_ids, int) else list(res_ids)
+            return self.env['account.pagare.pdf.cache'].render(self, res_ids, data=data)
+        return super(IrActionsReport, self).render_qweb_pdf(res_ids, data=data)
+
+    @api.multi
+    def render_qweb_html(self, docids, data=None):
+        stats = self.env['account.pagare.stats']
+        if stats._is_enabled() and self._is_pagare_report():
+            with stats.measure('render_qweb_html', self.env['account.payment'].browse(docids)):
+                return super(IrActionsReport, self).render_qweb_html(docids, data=data)
+        return super(IrActionsReport, self).render_qweb_html(docids, data=data)
+
+    @api.model
+    def _run_wkhtmltopdf(self, bodies, header=None, footer=None, landscape=False, specific_paperformat_args=None,
+                         set_viewport_size=False):
+        stats = self.env['account.pagare.stats']
+        if stats._is_enabled() and self and self._is_pagare_report():
+            with stats.measure('wkhtmltopdf') as measure:
+                measure['rows'] = len(bodies)
+                return super(IrActionsReport, self)._run_wkhtmltopdf(
+                    bodies, header=header, footer=footer, landscape=landscape,
+                    specific_paperformat_args=specific_paperformat_args, set_viewport_size=set_viewport_size)
+        return super(IrActionsReport, self)._run_wkhtmltopdf(
+            bodies, header=header, footer=footer, landscape=landscape,
+            specific_paperformat_args=specific_paperformat_args, set_viewport_size=set_viewport_size)
@@ -0,0 +1,52 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models, tools
+
+
+class PagareAmountWords(models.AbstractModel):
+    _name = 'account.pagare.amount.words'
+    _description = 'Pagare Amount in Words'
+
+    @api.model
+    @tools.ormcache('currency_id', 'amount', 'lang')
+    def _amount_to_words(self, currency_id, amount, lang):
+        return self.env['res.currency'].browse(currency_id).with_context(lang=lang).amount_to_text(amount)
+
+    @api.model
+    def amount_to_words(self, currency, amount):
+        """ Return the amount in words, memoized by (currency, amount, language) """
+        if not currency:
+            return ''
+        lang = self.env.context.get('lang') or self.env.user.lang
+        return self._amount_to_words(currency.id, currency.round(amount), lang)
+
+    @api.model
+    def fill_stars(self, amount_in_words):
+        if amount_in_words and len(amount_in_words) < 170:
+            stars = (170 - len(amount_in_words)) // 2
+            return ' '.join([amount_in_words, '* ' * stars])
+        else:
+            return amount_in_words
+
+    @api.model
+    def get_padded_amounts_in_words(self, payments):
+        """ Return the amount in words of each payment, padded with stars for printing """
+        return {payment.id: self.fill_stars(payment.pagare_amount_in_words or
+                                            self.amount_to_words(payment.currency_id, payment.amount))
+                for payment in payments}
+
+    @api.model
+    def fill_pagare_amount_in_words(self, payments):
+        """ Set the amount in words of all the payments with a single statement """
+        if not payments:
+            return
+        words = [self.amount_to_words(payment.currency_id, payment.amount) for payment in payments]
+        self.env.cr.execute("""
+            UPDATE account_payment payment
+               SET pagare_amount_in_words = vals.words
+              FROM unnest(%s::int[], %s::varchar[]) AS vals(id, words)
+             WHERE payment.id = vals.id
+        """, (payments.ids, words))
+        payments.invalidate_cache(['pagare_amount_in_words'], payments.ids)
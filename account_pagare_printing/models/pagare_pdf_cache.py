@@ -0,0 +1,161 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import base64
+import hashlib
+
+from odoo import api, models
+
+from .pdf_tools import merge_pdfs, split_pdf
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Technical res_field of the cached pagares, it hides them from the attachments of the payments
+PDF_CACHE_FIELD = 'pagare_pdf_cache'
+
+
+class PagarePdfCache(models.AbstractModel):
+    """ Cache of the rendered pagares, one PDF attachment per payment named after a hash of
+        everything printed on it: the payment, its reconciliations, the partner, the company
+        and the layout. A reprint only renders the pagares whose hash changed.
+    """
+    _name = 'account.pagare.pdf.cache'
+    _description = 'Pagare PDF Cache'
+
+    def _get_max_size(self):
+        """ Maximum size of the cache in bytes, 0 disables it """
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_pagare_printing.pdf_cache_size', 100)) * 1024 * 1024
+
+    @api.model
+    def _get_keys(self, report, payments):
+        """ Return {payment id: hash} for the given report, with a single query for the
+            reconciliations and invoices of the whole batch.
+        """
+        self.env.cr.execute("""
+            SELECT payment.id,
+                   (SELECT array_agg(apr.id ORDER BY apr.id)
+                      FROM account_move_line line
+                      JOIN account_partial_reconcile apr
+                        ON apr.debit_move_id = line.id OR apr.credit_move_id = line.id
+                     WHERE line.payment_id = payment.id),
+                   (SELECT MAX(invoice.write_date)
+                      FROM account_invoice_payment_rel rel
+                      JOIN account_invoice invoice ON invoice.id = rel.invoice_id
+                     WHERE rel.payment_id = payment.id)
+              FROM account_payment payment
+             WHERE payment.id IN %s
+        """, (tuple(payments.ids),))
+        reconciliations = {row[0]: row[1:] for row in self.env.cr.fetchall()}
+        view = self.env.ref(report.report_name, raise_if_not_found=False)
+        layout = (report.id, report.report_name, report.write_date, view and view.write_date)
+        keys = {}
+        for payment in payments:
+            values = (
+                layout, payment.id, payment.partner_id.id, payment.partner_id.write_date,
+                payment.company_id.write_date, payment.journal_id.pagare_layout_id.id,
+                payment.journal_id.bank_id.name, payment.currency_id.id, payment.amount, payment.payment_date,
+                payment.pagare_due_date, payment.pagare_number, payment.pagare_amount_in_words,
+                payment.communication, payment.name, reconciliations.get(payment.id),
+                self.env.context.get('lang'),
+            )
+            keys[payment.id] = hashlib.sha1(repr(values).encode('utf-8')).hexdigest()
+        return keys
+
+    def _get_attachment_name(self, key):
+        return 'pagare-%s.pdf' % key
+
+    @api.model
+    def _get_cached(self, keys):
+        """ Return {payment id: attachment} of the pagares with an up to date cache """
+        attachments = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', 'account.payment'),
+            ('res_field', '=', PDF_CACHE_FIELD),
+            ('res_id', 'in', list(keys)),
+            ('name', 'in', [self._get_attachment_name(key) for key in keys.values()]),
+        ])
+        cached = {attachment.res_id: attachment for attachment in attachments
+                  if attachment.name == self._get_attachment_name(keys[attachment.res_id])}
+        if cached:
+            # Keep the most used pagares when evicting
+            self.env.cr.execute("""
+                UPDATE ir_attachment SET write_date = (now() at time zone 'UTC') WHERE id IN %s
+            """, (tuple(attachment.id for attachment in cached.values()),))
+        return cached
+
+    @api.model
+    def _store(self, keys, pdfs):
+        """ Save the rendered pagares {payment id: pdf}, replacing their previous versions """
+        Attachment = self.env['ir.attachment'].sudo()
+        Attachment.search([
+            ('res_model', '=', 'account.payment'),
+            ('res_field', '=', PDF_CACHE_FIELD),
+            ('res_id', 'in', list(pdfs)),
+        ]).unlink()
+        for payment_id, pdf in pdfs.items():
+            name = self._get_attachment_name(keys[payment_id])
+            Attachment.create({
+                'name': name,
+                'datas_fname': name,
+                'datas': base64.b64encode(pdf),
+                'res_model': 'account.payment',
+                'res_field': PDF_CACHE_FIELD,
+                'res_id': payment_id,
+                'mimetype': 'application/pdf',
+            })
+
+    @api.model
+    def _evict(self):
+        """ Remove the least recently used pagares beyond the maximum size of the cache """
+        self.env.cr.execute("""
+            SELECT id
+              FROM (SELECT id, SUM(file_size) OVER (ORDER BY write_date DESC, id DESC) AS total
+                      FROM ir_attachment
+                     WHERE res_model = 'account.payment' AND res_field = %s) cache
+             WHERE total > %s
+        """, (PDF_CACHE_FIELD, self._get_max_size()))
+        attachment_ids = [row[0] for row in self.env.cr.fetchall()]
+        if attachment_ids:
+            self.env['ir.attachment'].sudo().browse(attachment_ids).unlink()
+
+    @api.model
+    def clear(self):
+        self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', 'account.payment'),
+            ('res_field', '=', PDF_CACHE_FIELD),
+        ]).unlink()
+
+    @api.model
+    def render(self, report, res_ids, data=None):
+        """ Return the PDF of the pagares res_ids in this order and its format, like
+            render_qweb_pdf(), rendering only the ones which are not cached yet at once.
+        """
+        payments = self.env['account.payment'].browse(res_ids)
+        keys = self._get_keys(report, payments)
+        cached = self._get_cached(keys)
+        missing_ids = [res_id for res_id in res_ids if res_id not in cached]
+        pdfs = {}
+        if missing_ids:
+            pdf_content, report_format = report._render_pagare_documents(missing_ids, data=data)
+            documents = None
+            if report_format != 'pdf':
+                # The report was rendered in HTML (test mode of the server), nothing to cache
+                pass
+            elif len(missing_ids) == 1:
+                documents = [pdf_content]
+            else:
+                documents = split_pdf(pdf_content, len(missing_ids))
+            if documents is None:
+                if not cached:
+                    return pdf_content, report_format
+                _logger.info("The pagares %s could not be split, rendering them without cache", missing_ids)
+                return report.with_context(pagare_pdf_cache=False).render_qweb_pdf(res_ids, data=data)
+            pdfs = dict(zip(missing_ids, documents))
+            self._store(keys, pdfs)
+            self._evict()
+        for res_id, attachment in cached.items():
+            pdfs[res_id] = base64.b64decode(attachment.datas)
+        return merge_pdfs([pdfs[res_id] for res_id in res_ids]), 'pdf'
@@ -0,0 +1,56 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import io
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+try:
+    from PyPDF2 import PdfFileReader, PdfFileWriter
+except ImportError:
+    _logger.debug('Cannot import PyPDF2')
+
+
+def merge_pdfs(pdfs):
+    """ Return a single PDF with the pages of the given PDFs, in order """
+    writer = PdfFileWriter()
+    for pdf in pdfs:
+        reader = PdfFileReader(io.BytesIO(pdf))
+        for page in range(reader.getNumPages()):
+            writer.addPage(reader.getPage(page))
+    result = io.BytesIO()
+    writer.write(result)
+    return result.getvalue()
+
+
+def split_pdf(pdf_content, count):
+    """ Split a PDF rendered from count documents using the outline entry wkhtmltopdf adds
+        for each of them. Return None when the documents cannot be told apart.
+    """
+    reader = PdfFileReader(io.BytesIO(pdf_content))
+    root = reader.trailer['/Root']
+    if '/Outlines' not in root or '/First' not in root['/Outlines']:
+        return None
+    outlines_pages = []
+    node = root['/Outlines']['/First']
+    while True:
+        outlines_pages.append(root['/Dests'][node['/Dest']][0])
+        if '/Next' not in node:
+            break
+        node = node['/Next']
+    outlines_pages = sorted(set(outlines_pages))
+    if len(outlines_pages) != count:
+        return None
+    pdfs = []
+    for index, first_page in enumerate(outlines_pages):
+        last_page = outlines_pages[index + 1] if index + 1 < len(outlines_pages) else reader.numPages
+        writer = PdfFileWriter()
+        for page in range(first_page, last_page):
+            writer.addPage(reader.getPage(page))
+        stream = io.BytesIO()
+        writer.write(stream)
+        pdfs.append(stream.getvalue())
+    return pdfs
@@ -4,8 +4,10 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 import time
-from odoo import api, models
+from odoo import api, fields, models
 from odoo.tools import float_is_zero
+from odoo.tools.misc import formatLang, format_date
+from odoo.addons.account_pagare_printing.models.account_pagare_stats import measure_stage
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -15,20 +17,91 @@ class ReportPagarePrinting(models.AbstractModel):
     _name = 'report.account_pagare_printing.report_pagare_base'
 
     def fill_stars(self, amount_in_word):
-        if amount_in_word and len(amount_in_word) < 170:
-            stars = (170 - len(amount_in_word)) // 2
-            return ' '.join([amount_in_word, '* ' * stars])
-        else:
-            return amount_in_word
+        return self.env['account.pagare.amount.words'].fill_stars(amount_in_word)
+
+    def _get_paid_partials(self, payments):
+        """ Load the partial reconciliations between the move lines of the payments
+            and the receivable/payable lines of their invoices in a single query.
+
+            Return a dict mapping (payment id, invoice id) to a list of
+            (amount, amount_currency, currency_id, company_currency_id, date) tuples,
+            one for each payment move line. Like the former per-record loop, only the
+            last partial of each payment move line is kept.
+        """
+        partials = {}
+        if not payments:
+            return partials
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (part.pay_line_id, part.invoice_id)
+                   part.payment_id, part.invoice_id, part.amount, part.amount_currency,
+                   part.currency_id, company.currency_id, part.date
+              FROM (
+                    SELECT pay_line.id AS pay_line_id, pay_line.payment_id, pay_line.company_id,
+                           pay_line.date, inv.id AS invoice_id, apr.id AS partial_id,
+                           apr.amount, apr.amount_currency, apr.currency_id
+                      FROM account_move_line pay_line
+                      JOIN account_partial_reconcile apr ON apr.credit_move_id = pay_line.id
+                      JOIN account_move_line inv_line ON inv_line.id = apr.debit_move_id
+                      JOIN account_invoice inv ON inv.id = inv_line.invoice_id
+                                              AND inv.account_id = inv_line.account_id
+                     WHERE pay_line.payment_id IN %(payment_ids)s
+                       AND inv.type IN ('out_invoice', 'in_refund')
+                 UNION ALL
+                    SELECT pay_line.id, pay_line.payment_id, pay_line.company_id,
+                           pay_line.date, inv.id, apr.id,
+                           apr.amount, apr.amount_currency, apr.currency_id
+                      FROM account_move_line pay_line
+                      JOIN account_partial_reconcile apr ON apr.debit_move_id = pay_line.id
+                      JOIN account_move_line inv_line ON inv_line.id = apr.credit_move_id
+                      JOIN account_invoice inv ON inv.id = inv_line.invoice_id
+                                              AND inv.account_id = inv_line.account_id
+                     WHERE pay_line.payment_id IN %(payment_ids)s
+                       AND inv.type IN ('in_invoice', 'out_refund')
+                   ) part
+              JOIN res_company company ON company.id = part.company_id
+          ORDER BY part.pay_line_id, part.invoice_id, part.partial_id DESC
+        """, {'payment_ids': tuple(payments.ids)})
+        for payment_id, invoice_id, amount, amount_currency, currency_id, company_currency_id, date \
+                in self.env.cr.fetchall():
+            partials.setdefault((payment_id, invoice_id), []).append(
+                (amount, amount_currency, currency_id, company_currency_id, fields.Date.to_string(date)))
+        return partials
 
     @api.multi
     def get_paid_lines(self, payments):
-        lines = {}
-        for payment in payments:
-            lines[payment.id] = []
-            for invoice in payment.invoice_ids:
-                amount_currency = 0.0
-                amount = 0.0
+        """ Return a dict mapping each payment id to the list of invoices it pays.
+
+            The invoices and partial reconciliations of the whole batch are loaded
+            in grouped queries and the currency rates are cached per (currency, date),
+            so the number of queries does not grow with the number of payments.
+        """
+        lines = {payment.id: [] for payment in payments}
+        if not payments:
+            return lines
+        self.env.cr.execute("""
+            SELECT invoice_id, payment_id
+              FROM account_invoice_payment_rel
+             WHERE payment_id IN %s
+        """, (tuple(payments.ids),))
+        payment_ids_by_invoice = {}
+        for invoice_id, payment_id in self.env.cr.fetchall():
+            payment_ids_by_invoice.setdefault(invoice_id, []).append(payment_id)
+        # search() sorts the invoices like the payment.invoice_ids relation does
+        invoices = self.env['account.invoice'].search([('id', 'in', list(payment_ids_by_invoice))])
+        partials = self._get_paid_partials(payments)
+        currency_obj = self.env['res.currency']
+        rates = {}
+
+        def compute_amount(amount, from_currency, to_currency, date):
+            if from_currency == to_currency:
+                return to_currency.round(amount)
+            key = (from_currency.id, to_currency.id, date)
+            if key not in rates:
+                rates[key] = currency_obj.with_context(date=date)._get_conversion_rate(from_currency, to_currency)
+            return to_currency.round(amount * rates[key])
+
+        for invoice in invoices:
+            for payment_id in payment_ids_by_invoice[invoice.id]:
                 line = {
                     'date': invoice.date_invoice,
                     'date_due': invoice.date_due,
@@ -40,52 +113,82 @@ class ReportPagarePrinting(models.AbstractModel):
                 if invoice.type == 'out_refund':
                     line['amount_total'] *= -1
                 total_amount_to_show = 0.0
-                for pay in invoice.payment_move_line_ids:
-                    if pay.payment_id == payment:
-                        if invoice.type in ('out_invoice', 'in_refund'):
-                            for p in pay.matched_debit_ids:
-                                if p.credit_move_id == pay:
-                                    if p.debit_move_id.invoice_id == invoice:
-                                        amount = p.amount
-                                        amount_currency = p.amount_currency
-                                        payment_currency_id = p.currency_id
-                        elif invoice.type in ('in_invoice', 'out_refund'):
-                            for p in pay.matched_credit_ids:
-                                if p.debit_move_id == pay:
-                                    if p.credit_move_id.invoice_id == invoice:
-                                        amount = p.amount
-                                        amount_currency = p.amount_currency
-                                        payment_currency_id = p.currency_id
-
-                        if payment_currency_id and payment_currency_id == \
-                                invoice.currency_id:
-                            amount_to_show = amount_currency
-                        else:
-                            amount_to_show = \
-                                pay.company_id.currency_id.with_context(
-                                    date=pay.date).compute(
-                                    amount, invoice.currency_id)
-                        if not float_is_zero(
-                                amount_to_show,
-                                precision_rounding=invoice.currency_id.rounding):
-                            total_amount_to_show += amount_to_show
+                for amount, amount_currency, currency_id, company_currency_id, date in \
+                        partials.get((payment_id, invoice.id), []):
+                    if currency_id and currency_id == invoice.currency_id.id:
+                        amount_to_show = amount_currency
+                    else:
+                        amount_to_show = compute_amount(
+                            amount, currency_obj.browse(company_currency_id), invoice.currency_id, date)
+                    if not float_is_zero(amount_to_show, precision_rounding=invoice.currency_id.rounding):
+                        total_amount_to_show += amount_to_show
                 if invoice.type in ['in_refund', 'out_refund']:
                     total_amount_to_show *= -1
                 line['paid_amount'] = total_amount_to_show
-                lines[payment.id].append(line)
+                lines[payment_id].append(line)
         return lines
 
     @api.multi
+    def get_pagare_values(self, payments, paid_lines, amounts_in_words):
+        """ Return a dict mapping each payment id to the flat values printed on its pagare,
+            so that the template does not format dates, walk relations or encode images
+            for every document. The logo of each company is encoded once for the batch.
+        """
+        precision = self.env['decimal.precision'].precision_get('Product Price')
+        logos = {}
+        values = {}
+        for payment in payments:
+            company = payment.company_id
+            if company.id not in logos:
+                logos[company.id] = company.logo and 'data:image/png;base64,%s' % company.logo.decode() or False
+            payment_date = fields.Date.from_string(payment.payment_date)
+            due_date = payment.pagare_due_date and fields.Date.from_string(payment.pagare_due_date)
+            partner = payment.partner_id
+            lines = []
+            for line in paid_lines.get(payment.id, []):
+                lines.append(dict(line,
+                                  date_formatted=line['date'] and format_date(self.env, line['date']) or '',
+                                  paid_amount_formatted=formatLang(self.env, line['paid_amount'],
+                                                                   currency_obj=payment.currency_id)))
+            paid_total = sum(line['paid_amount'] for line in lines)
+            values[payment.id] = {
+                'logo': logos[company.id],
+                'company_city': company.city or '',
+                'partner_name': partner.name or '',
+                'partner_address': [address_line for address_line in
+                                    partner._display_address(without_company=True).split('\n')
+                                    if address_line.strip()],
+                'bank_name': payment.journal_id.bank_id.name or '',
+                'pagare_number': payment.pagare_number,
+                'payment_date': payment_date.strftime('%-d de %B de %Y'),
+                'payment_day': payment_date.strftime('%-d'),
+                'payment_month': payment_date.strftime('%B'),
+                'payment_year': payment_date.strftime('%Y'),
+                'due_date': due_date and due_date.strftime('%-d de %B de %Y') or '',
+                'amount': formatLang(self.env, payment.amount, digits=precision),
+                'amount_in_words': amounts_in_words.get(payment.id, ''),
+                'lines': lines,
+                'paid_total': formatLang(self.env, paid_total, currency_obj=payment.currency_id),
+            }
+        return values
+
+    @api.multi
+    @measure_stage('get_report_values', lambda self, docids, data=None: self.env['account.payment'].browse(docids))
     def get_report_values(self, docids, data=None):
         model = self.env.context.get('active_model', 'account.payment')
         objects = self.env[model].browse(docids)
-        paid_lines = self.get_paid_lines(objects)
+        with self.env['account.pagare.stats'].measure('get_paid_lines', objects) as measure:
+            paid_lines = self.get_paid_lines(objects)
+            measure['rows'] = sum(len(lines) for lines in paid_lines.values())
+        amounts_in_words = self.env['account.pagare.amount.words'].get_padded_amounts_in_words(objects)
         docargs = {
             'doc_ids': docids,
             'doc_model': model,
             'docs': objects,
             'time': time,
             'fill_stars': self.fill_stars,
-            'paid_lines': paid_lines
+            'amounts_in_words': amounts_in_words,
+            'paid_lines': paid_lines,
+            'pagare_values': self.get_pagare_values(objects, paid_lines, amounts_in_words),
         }
         return docargs
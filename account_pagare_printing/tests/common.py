@@ -0,0 +1,186 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import os
+import time
+from datetime import timedelta
+
+from odoo import fields
+from odoo.addons.account.tests.account_test_classes import AccountingTestCase
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Number of records generated for each benchmark, the query count checks run it twice as well
+BENCHMARK_SIZE = int(os.environ.get('PAGARE_BENCHMARK_SIZE', 10))
+# Extra queries allowed when the batch size doubles, for a stage that must not do per-record queries
+QUERY_COUNT_TOLERANCE = 3
+
+
+class PagareBenchmarkCase(AccountingTestCase):
+    """ Generate synthetic data for the pagare flow and measure the time and the number of SQL
+        queries of its stages. The size of the generated data is set with the
+        PAGARE_BENCHMARK_SIZE environment variable.
+    """
+
+    def setUp(self):
+        super(PagareBenchmarkCase, self).setUp()
+        self.size = BENCHMARK_SIZE
+        self.company = self.env.user.company_id
+        self.today = fields.Date.context_today(self.env.user)
+        self.method_outbound = self.env.ref('account_pagare_printing.account_payment_method_outbound_pagare')
+        self.method_inbound = self.env.ref('account_pagare_printing.account_payment_method_inbound_pagare')
+        self.layout = self.env.ref('account_pagare_printing.account_payment_pagare_report_base')
+        self.currency_eur = self.company.currency_id
+        self.currency_usd = self.env.ref('base.USD')
+        if self.currency_usd == self.currency_eur:
+            self.currency_usd = self.env.ref('base.EUR')
+        self.currency_usd.active = True
+        self.env['res.currency.rate'].create({
+            'name': self.today,
+            'rate': 1.25,
+            'currency_id': self.currency_usd.id,
+            'company_id': self.company.id,
+        })
+        self.account_payable = self._get_account('account.data_account_type_payable')
+        self.account_receivable = self._get_account('account.data_account_type_receivable')
+        self.account_expense = self._get_account('account.data_account_type_expenses')
+        self.account_revenue = self._get_account('account.data_account_type_revenue')
+        self.journal_sequence = 0
+
+    def _get_account(self, user_type_xmlid):
+        return self.env['account.account'].search([
+            ('user_type_id', '=', self.env.ref(user_type_xmlid).id),
+            ('company_id', '=', self.company.id),
+        ], limit=1)
+
+    # Data generation
+
+    def _create_journals(self, count, manual_sequencing=False):
+        journals = self.env['account.journal']
+        for i in range(count):
+            self.journal_sequence += 1
+            journals += self.env['account.journal'].create({
+                'name': 'Pagare Bench %d' % self.journal_sequence,
+                'code': 'PB%d' % self.journal_sequence,
+                'type': 'bank',
+                'company_id': self.company.id,
+                'pagare_manual_sequencing': manual_sequencing,
+                'pagare_layout_id': self.layout.id,
+            })
+        return journals
+
+    def _create_partners(self, count):
+        partners = self.env['res.partner']
+        for i in range(count):
+            partners += self.env['res.partner'].create({
+                'name': 'Pagare Bench Partner %d' % i,
+                'supplier': True,
+                'customer': True,
+                'property_account_payable_id': self.account_payable.id,
+                'property_account_receivable_id': self.account_receivable.id,
+            })
+        return partners
+
+    def _create_invoices(self, partners, invoice_type='in_invoice', per_partner=1, currency=None):
+        """ Create and validate per_partner invoices of each partner, with different due dates """
+        supplier = invoice_type in ('in_invoice', 'in_refund')
+        invoices = self.env['account.invoice']
+        for index, partner in enumerate(partners):
+            for i in range(per_partner):
+                invoices += self.env['account.invoice'].create({
+                    'partner_id': partner.id,
+                    'type': invoice_type,
+                    'reference': 'BENCH/%d/%d' % (index, i),
+                    'account_id': (self.account_payable if supplier else self.account_receivable).id,
+                    'currency_id': (currency or self.currency_eur).id,
+                    'date_invoice': self.today,
+                    'date_due': fields.Date.to_string(
+                        fields.Date.from_string(self.today) + timedelta(days=30 + index + i)),
+                    'invoice_line_ids': [(0, 0, {
+                        'name': 'Pagare benchmark',
+                        'quantity': 1,
+                        'price_unit': 100.0 + index + i,
+                        'account_id': (self.account_expense if supplier else self.account_revenue).id,
+                    })],
+                })
+        invoices.action_invoice_open()
+        return invoices
+
+    def _register_payments(self, invoices, journal, payment_method=None):
+        wizard = self.env['account.register.payments'].with_context(
+            active_model='account.invoice', active_ids=invoices.ids,
+        ).create({
+            'payment_date': self.today,
+            'journal_id': journal.id,
+            'payment_method_id': (payment_method or self.method_outbound).id,
+        })
+        wizard._onchange_payment_method_id()
+        wizard.create_payments()
+        return self.env['account.payment'].search([('invoice_ids', 'in', invoices.ids)])
+
+    def _create_draft_payments(self, invoices, journal, currency=None, payment_method=None):
+        """ Create one draft emitted pagare (or payment of the given method) for each invoice,
+            paid in the given currency
+        """
+        payments = self.env['account.payment']
+        for invoice in invoices:
+            amount = invoice.residual
+            if currency and currency != invoice.currency_id:
+                amount = invoice.currency_id.compute(amount, currency)
+            payments += self.env['account.payment'].create({
+                'payment_type': 'outbound',
+                'partner_type': 'supplier',
+                'partner_id': invoice.partner_id.id,
+                'amount': amount,
+                'currency_id': (currency or invoice.currency_id).id,
+                'journal_id': journal.id,
+                'payment_method_id': (payment_method or self.method_outbound).id,
+                'payment_date': self.today,
+                'pagare_due_date': invoice.date_due,
+                'invoice_ids': [(6, 0, invoice.ids)],
+            })
+        return payments
+
+    def _create_pagares(self, count, journal, multi_currency=True):
+        """ Create count posted emitted pagares, half of them paying foreign currency invoices """
+        partners = self._create_partners(count)
+        foreign = count // 2 if multi_currency else 0
+        invoices = self._create_invoices(partners[:count - foreign])
+        payments = self._create_draft_payments(invoices, journal)
+        if foreign:
+            invoices = self._create_invoices(partners[count - foreign:], currency=self.currency_usd)
+            payments += self._create_draft_payments(invoices, journal, currency=self.currency_eur)
+        payments.post()
+        return payments
+
+    # Measures
+
+    def _measure(self, stage, size, func, *args, **kwargs):
+        """ Run func and return its result and the number of queries it executed """
+        self.env.invalidate_all()
+        cr = self.env.cr
+        queries = cr.sql_log_count
+        start = time.time()
+        res = func(*args, **kwargs)
+        duration = time.time() - start
+        queries = cr.sql_log_count - queries
+        _logger.info("Pagare benchmark [%s] N=%d: %.3fs, %d queries", stage, size, duration, queries)
+        return res, queries
+
+    def assertFlatQueryCount(self, stage, prepare):
+        """ Check that a stage does not run per-record queries.
+
+            :param prepare: function taking a batch size, generating its data and returning the
+                            function to measure
+        """
+        counts = []
+        for size in (self.size, self.size * 2):
+            func = prepare(size)
+            counts.append(self._measure(stage, size, func)[1])
+        self.assertLessEqual(
+            counts[1], counts[0] + QUERY_COUNT_TOLERANCE,
+            "%s ran %d queries for %d records and %d queries for %d records"
+            % (stage, counts[0], self.size, counts[1], self.size * 2))
@@ -0,0 +1,548 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import base64
+import hashlib
+import io
+from unittest.mock import patch
+
+from PyPDF2 import PdfFileReader, PdfFileWriter
+
+from odoo.tests import common
+
+from .common import PagareBenchmarkCase, QUERY_COUNT_TOLERANCE
+
+
+def _blank_pdf(pages):
+    writer = PdfFileWriter()
+    for page in range(pages):
+        writer.addBlankPage(595, 842)
+    stream = io.BytesIO()
+    writer.write(stream)
+    return stream.getvalue()
+
+
+@common.at_install(False)
+@common.post_install(True)
+class TestPagarePerformance(PagareBenchmarkCase):
+
+    def test_01_register_payments_single(self):
+        journal = self._create_journals(1, manual_sequencing=True)
+        invoices = self._create_invoices(self._create_partners(1), per_partner=self.size)
+        payments, queries = self._measure('register payments (single)', self.size,
+                                          self._register_payments, invoices, journal)
+        self.assertEqual(len(payments), 1)
+        self.assertEqual(payments.pagare_due_date, min(invoices.mapped('date_due')))
+
+    def test_02_register_payments_multi(self):
+        journal = self._create_journals(1, manual_sequencing=True)
+        partners = self._create_partners(self.size)
+        invoices = self._create_invoices(partners, per_partner=2)
+        next_number = journal.pagare_next_number
+        payments, queries = self._measure('register payments (multi)', self.size,
+                                          self._register_payments, invoices, journal)
+        self.assertEqual(len(payments), self.size)
+        # The numbers are reserved as one block, without gaps
+        self.assertEqual(sorted(payments.mapped('pagare_number')),
+                         list(range(next_number, next_number + self.size)))
+        for payment in payments:
+            self.assertEqual(payment.pagare_due_date, min(payment.invoice_ids.mapped('date_due')))
+            self.assertTrue(payment.pagare_amount_in_words)
+
+    def test_02b_reserve_numbers_standard_sequence(self):
+        journal = self._create_journals(1, manual_sequencing=True)
+        journal.pagare_sequence_id.implementation = 'standard'
+        first = journal._reserve_pagare_numbers(3)
+        self.assertEqual(len(set(first)), 3)
+        # The numbers come from the postgres sequence, they are never handed out twice
+        self.assertFalse(set(first) & set(journal._reserve_pagare_numbers(3)))
+        self.assertGreater(journal.pagare_sequence_id.number_next_actual, max(first))
+
+    def test_02c_reserve_numbers_after_last_number(self):
+        # Pagares printed on pre-numbered paper up to number 20 before the switch to manual numbering
+        journal = self._create_journals(1)
+        journal.pagare_last_number = 20
+        journal.pagare_manual_sequencing = True
+        self.assertEqual(journal._reserve_pagare_numbers(2), [21, 22])
+        self.assertEqual(journal._reserve_pagare_numbers(1), [23])
+        payments = self._create_pagares(2, journal, multi_currency=False)
+        self.assertEqual(sorted(payments.mapped('pagare_number')), [24, 25])
+        # A standard sequence reset below the numbers already used
+        journal.pagare_sequence_id.implementation = 'standard'
+        journal.pagare_sequence_id.number_next_actual = 1
+        self.assertEqual(journal._reserve_pagare_numbers(2), [26, 27])
+
+    def test_03_post(self):
+        journal = self._create_journals(1)
+        method_manual = self.env.ref('account.account_payment_method_manual_out')
+
+        def count_queries(size, payment_method):
+            invoices = self._create_invoices(self._create_partners(size))
+            payments = self._create_draft_payments(invoices, journal, payment_method=payment_method)
+            return self._measure('post (%s)' % payment_method.code, size, payments.post)[1]
+
+        # The core post() creates one move per payment, the pagare part of it must not add
+        # queries per payment compared to a manual payment
+        overheads = []
+        for size in (self.size, self.size * 2):
+            overheads.append(count_queries(size, self.method_outbound) - count_queries(size, method_manual))
+        self.assertLessEqual(
+            overheads[1], overheads[0] + QUERY_COUNT_TOLERANCE,
+            "Posting pagares ran %d more queries than manual payments for %d payments and %d more for %d"
+            % (overheads[0], self.size, overheads[1], self.size * 2))
+
+    def test_04_print_pagares(self):
+        def prepare_print(size):
+            payments = self._create_pagares(size, self._create_journals(1), multi_currency=False)
+            action = payments.print_pagares()
+            wizard = self.env['print.prenumbered.pagares'].with_context(action['context']).create({})
+            return wizard.print_pagares
+
+        # Numbering, sent state and report action of the pre-numbered pagares
+        self.assertFlatQueryCount('print pre-numbered pagares', prepare_print)
+
+        report = self.env['ir.actions.report']._get_report_from_name(self.layout.report)
+
+        def prepare_render(size):
+            payments = self._create_pagares(size, self._create_journals(1))
+            return lambda: report.render_qweb_html(payments.ids)
+
+        self.assertFlatQueryCount('render pagares', prepare_render)
+
+    def test_05_prenumbered_wizard(self):
+        def prepare(size):
+            payments = self._create_pagares(size, self._create_journals(1), multi_currency=False)
+            return lambda: payments._set_pagare_numbers_from_printing(1)
+
+        self.assertFlatQueryCount('bulk renumbering', prepare)
+
+        journal = self._create_journals(1)
+        payments = self._create_pagares(self.size, journal, multi_currency=False)
+        action = payments.print_pagares()
+        wizard = self.env['print.prenumbered.pagares'].with_context(action['context']).create({})
+        self.assertEqual(wizard.line_ids.next_pagare_number, 1)
+        self._measure('prenumbered wizard', self.size, wizard.print_pagares)
+        self.assertEqual(payments.mapped('pagare_number'), list(range(1, self.size + 1)))
+        self.assertEqual(payments[0].name, 'Emitted pagare: 1')
+        self.assertEqual(journal.pagare_last_number, self.size)
+        self.assertTrue(all(state == 'sent' for state in payments.mapped('state')))
+
+    def test_06_get_report_values(self):
+        report = self.env['report.account_pagare_printing.report_pagare_base']
+
+        def prepare(size):
+            payments = self._create_pagares(size, self._create_journals(1))
+            return lambda: report.get_report_values(payments.ids)
+
+        self.assertFlatQueryCount('get_report_values', prepare)
+
+        payments = self._create_pagares(2, self._create_journals(1))
+        paid_lines = report.get_paid_lines(payments)
+        for payment in payments:
+            self.assertEqual(len(paid_lines[payment.id]), 1)
+            line = paid_lines[payment.id][0]
+            invoice = payment.invoice_ids
+            self.assertEqual(line['number'], invoice.number)
+            self.assertAlmostEqual(line['paid_amount'], invoice.amount_total - invoice.residual,
+                                   places=invoice.currency_id.decimal_places)
+
+        values = report.get_report_values(payments.ids)['pagare_values']
+        for payment in payments:
+            self.assertEqual(values[payment.id]['partner_name'], payment.partner_id.name)
+            self.assertEqual(len(values[payment.id]['lines']), 1)
+            self.assertTrue(values[payment.id]['amount_in_words'])
+        # The logo of the company is encoded once for all the documents
+        self.assertEqual(len({value['logo'] for value in values.values()}), 1)
+
+    def test_07_journal_dashboard(self):
+        def prepare(size):
+            journals = self._create_journals(size)
+            for journal in journals:
+                self._create_pagares(2, journal)
+            return journals._get_pagare_dashboard_datas
+
+        self.assertFlatQueryCount('journal dashboard pagare counters', prepare)
+
+        journal = self._create_journals(1)
+        self._create_pagares(self.size, journal)
+        datas, queries = self._measure('get_journal_dashboard_datas', 1, journal.get_journal_dashboard_datas)
+        self.assertEqual(datas['num_pagares_to_print'], self.size)
+        self.assertIn('account_balance', datas)
+        # The counters of the journals displayed together are computed with one query
+        journal_ids = journal.ids + self._create_journals(2).ids
+        counts = []
+        for ids in (journal_ids[:1], journal_ids):
+            self.env.invalidate_all()
+            queries = self.env.cr.sql_log_count
+            values = self.env['account.journal'].browse(ids).mapped('pagare_num_to_print')
+            counts.append(self.env.cr.sql_log_count - queries)
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(values, [self.size, 0, 0])
+
+    def test_08_issue_pagares(self):
+        journal = self._create_journals(1, manual_sequencing=True)
+        journal.pagare_outbound_bridge_account_id = self.account_expense
+        partners = self._create_partners(self.size)
+        invoices = self._create_invoices(partners, per_partner=2)
+        next_number = journal.pagare_next_number
+        wizard = self.env['issue.pagares'].create({
+            'journal_id': journal.id,
+            'payment_date': self.today,
+            'date_due_to': max(invoices.mapped('date_due')),
+            'partner_ids': [(6, 0, partners.ids)],
+            'batch_size': max(self.size // 2, 1),
+        })
+        action, queries = self._measure('issue pagares', self.size, wizard.issue_pagares)
+        payments = self.env['account.payment'].search(action['domain'])
+        # One pagare per vendor, numbered as one block
+        self.assertEqual(len(payments), self.size)
+        self.assertEqual(sorted(payments.mapped('pagare_number')),
+                         list(range(next_number, next_number + self.size)))
+        self.assertTrue(all(state == 'paid' for state in invoices.mapped('state')))
+        for payment in payments:
+            self.assertEqual(payment.state, 'posted')
+            self.assertEqual(payment.name, 'Emitted pagare: %d' % payment.pagare_number)
+            self.assertEqual(payment.pagare_due_date, min(payment.invoice_ids.mapped('date_due')))
+            liquidity_line = payment.move_line_ids.filtered(lambda l: l.account_id == self.account_expense)
+            self.assertEqual(liquidity_line.date_maturity, payment.pagare_due_date)
+            self.assertEqual(liquidity_line.name, payment.name)
+
+    def test_08b_issue_pagares_savings(self):
+        """ The moves are created by the core post(), one per pagare. What the wizard saves is the
+            reservation of the numbers in one block and the pagare checks and names once per batch.
+        """
+        def issue(one_by_one):
+            journal = self._create_journals(1, manual_sequencing=True)
+            partners = self._create_partners(self.size)
+            invoices = self._create_invoices(partners)
+            wizard = self.env['issue.pagares'].create({
+                'journal_id': journal.id,
+                'payment_date': self.today,
+                'date_due_to': max(invoices.mapped('date_due')),
+                'partner_ids': [(6, 0, partners.ids)],
+                'batch_size': self.size,
+            })
+
+            def issue_one_by_one():
+                payment_method = journal.outbound_payment_method_ids.filtered(
+                    lambda m: m.code == 'pagare_printing')
+                found = self.env['account.invoice'].search(wizard._get_invoices_domain(), order='date_due, id')
+                for vals in wizard._prepare_payments_vals(wizard._group_invoices(found), payment_method):
+                    self.env['account.payment'].create(vals).post()
+
+            func = issue_one_by_one if one_by_one else wizard.issue_pagares
+            stage = 'issue pagares (%s)' % ('one by one' if one_by_one else 'wizard')
+            queries = self._measure(stage, self.size, func)[1]
+            self.assertTrue(all(state == 'paid' for state in invoices.mapped('state')))
+            return queries
+
+        wizard_queries, one_by_one_queries = issue(False), issue(True)
+        self.assertGreaterEqual(
+            one_by_one_queries - wizard_queries, self.size,
+            "Issuing %d pagares ran %d queries with the wizard and %d one by one"
+            % (self.size, wizard_queries, one_by_one_queries))
+
+    def test_09_export_pagares(self):
+        journal = self._create_journals(1, manual_sequencing=True)
+        payments = self._create_pagares(self.size, journal, multi_currency=False)
+        for file_format in ('csv', 'fixed'):
+            wizard = self.env['export.pagares'].create({
+                'journal_id': journal.id,
+                'date_from': self.today,
+                'date_to': self.today,
+                'file_format': file_format,
+            })
+            # Small blocks, so that the file is written in several of them
+            with patch('odoo.addons.account_pagare_printing.wizard.export_pagares.EXPORT_CHUNK_SIZE', 1024):
+                action, queries = self._measure('export pagares (%s)' % file_format, self.size,
+                                                wizard.export_pagares)
+            attachment = self.env['ir.attachment'].browse(int(action['url'].split('/')[3].split('?')[0]))
+            content = base64.b64decode(attachment.datas)
+            self.assertEqual(attachment.file_size, len(content))
+            self.assertEqual(attachment.checksum, hashlib.sha1(content).hexdigest())
+            lines = content.decode('utf-8').splitlines()
+            self.assertEqual(len(lines), self.size + (file_format == 'csv'))
+            if file_format == 'fixed':
+                self.assertEqual(lines[0][:10], str(min(payments.mapped('pagare_number'))).rjust(10, '0'))
+
+    def test_10_collect_matured_pagares(self):
+        journal = self._create_journals(1)
+        journal.pagare_inbound_bridge_account_id = self.env['account.account'].create({
+            'name': 'Received pagares',
+            'code': 'PBRIDGE',
+            'user_type_id': self.env.ref('account.data_account_type_current_assets').id,
+            'reconcile': True,
+            'company_id': self.company.id,
+        })
+        partners = self._create_partners(self.size)
+        invoices = self._create_invoices(partners, invoice_type='out_invoice')
+        payments = self._register_payments(invoices, journal, payment_method=self.method_inbound)
+        bridge_lines = payments.mapped('move_line_ids').filtered(
+            lambda l: l.account_id == journal.pagare_inbound_bridge_account_id)
+        self.assertEqual(len(bridge_lines), self.size)
+        # Only the pagares matured on the given date are collected
+        first_maturity = min(bridge_lines.mapped('date_maturity'))
+        moves = self.env['account.journal']._cron_collect_matured_pagares(date=first_maturity)
+        self.assertEqual(len(moves), 1)
+        self.assertEqual(len(bridge_lines.filtered('reconciled')), 1)
+        moves, queries = self._measure('collect matured pagares', self.size,
+                                       self.env['account.journal']._cron_collect_matured_pagares,
+                                       date=max(bridge_lines.mapped('date_maturity')), batch_size=2)
+        self.assertTrue(all(bridge_lines.mapped('reconciled')))
+        bank_lines = moves.mapped('line_ids').filtered(lambda l: l.account_id == journal.default_debit_account_id)
+        self.assertEqual(len(bank_lines), len(moves))
+        self.assertEqual(set(moves.mapped('date')), set(bridge_lines.mapped('date_maturity')) - {first_maturity})
+
+    def test_11_stats(self):
+        journal = self._create_journals(1)
+        stats = self.env['account.pagare.stats']
+        self._create_pagares(2, journal, multi_currency=False)
+        self.assertFalse(stats.search([('journal_id', '=', journal.id)]))
+        self.env['ir.config_parameter'].sudo().set_param('account_pagare_printing.stats_enabled', '1')
+        payments = self._create_pagares(self.size, journal, multi_currency=False)
+        payments.print_pagares()
+        measures = stats.search([('journal_id', '=', journal.id)])
+        self.assertEqual(set(measures.mapped('stage')), {'post', 'print_pagares'})
+        self.assertEqual(measures.filtered(lambda m: m.stage == 'print_pagares').batch_size, self.size)
+
+    def test_12_journal_flags(self):
+        journals = self._create_journals(2)
+        self.assertTrue(all(journals.mapped('pagare_printing_outbound_payment_method_selected')))
+        self.assertEqual(self.env['account.journal'].search([
+            ('id', 'in', journals.ids),
+            ('pagare_printing_inbound_payment_method_selected', '=', True),
+        ]), journals)
+        journals[0].inbound_payment_method_ids -= self.method_inbound
+        self.assertFalse(journals[0].pagare_printing_inbound_payment_method_selected)
+        journals[1]._remove_pagare_payment_methods()
+        self.assertFalse(journals[1].pagare_printing_outbound_payment_method_selected)
+        journals.invalidate_cache()
+        self.assertEqual(journals.mapped('pagare_next_number'), [1, 1])
+
+    def test_13_print_several_journals(self):
+        journals = self._create_journals(2)
+        payments = self._create_pagares(2, journals[0], multi_currency=False)
+        payments += self._create_pagares(3, journals[1], multi_currency=False)
+        journals[1].pagare_last_number = 10
+        action = payments.print_pagares()
+        wizard = self.env['print.prenumbered.pagares'].with_context(action['context']).create({})
+        self.assertEqual(wizard.line_ids.mapped('journal_id'), journals)
+        self.assertEqual(wizard.line_ids.mapped('next_pagare_number'), [1, 11])
+        self.assertEqual(wizard.line_ids.mapped('payment_count'), [2, 3])
+        # Both journals share the base layout, so a single report is returned
+        action = wizard.print_pagares()
+        self.assertEqual(action['type'], 'ir.actions.report')
+        self.assertEqual(payments.filtered(lambda p: p.journal_id == journals[0]).mapped('pagare_number'), [1, 2])
+        self.assertEqual(payments.filtered(lambda p: p.journal_id == journals[1]).mapped('pagare_number'),
+                         [11, 12, 13])
+        groups = payments._get_pagare_print_groups()
+        self.assertEqual(len(groups), 1)
+        # Selected interleaved, the pagares of both journals are still printed one journal after
+        # the other, in the order of their numbers
+        interleaved = payments[4] + payments[0] + payments[3] + payments[1] + payments[2]
+        action = interleaved.do_print_pagares()
+        self.assertEqual(action['type'], 'ir.actions.report')
+        self.assertEqual(action['context']['active_ids'], payments.ids)
+
+        # With several layouts the pagares are queued in a print job instead of rendered in the request
+        layout = self.layout.copy({'name': 'Pagare Bench Layout',
+                                   'report': 'account_pagare_printing.report_pagare_bench'})
+        journals[1].pagare_layout_id = layout
+        action = payments.do_print_pagares()
+        job = self.env['account.payment.pagare.print.job'].browse(action['res_id'])
+        self.assertEqual(action['res_model'], 'account.payment.pagare.print.job')
+        self.assertEqual(job.state, 'pending')
+        self.assertEqual(job.payment_ids, payments)
+        self.assertEqual(len(job._get_print_chunks()), 2)
+
+    def test_14_collect_matured_pagares_errors(self):
+        journals = self._create_journals(2)
+        journals.write({'pagare_inbound_bridge_account_id': self.env['account.account'].create({
+            'name': 'Received pagares',
+            'code': 'PBRIDGE',
+            'user_type_id': self.env.ref('account.data_account_type_receivable').id,
+            'reconcile': True,
+            'company_id': self.company.id,
+        }).id})
+        partners = self._create_partners(2)
+        payments = self.env['account.payment']
+        for invoice in self._create_invoices(partners, invoice_type='out_invoice', per_partner=2):
+            payments |= self._register_payments(invoice, journals[1], payment_method=self.method_inbound)
+        failing_payments = self._register_payments(
+            self._create_invoices(partners[:1], invoice_type='out_invoice'), journals[0],
+            payment_method=self.method_inbound)
+        bridge_account = journals[0].pagare_inbound_bridge_account_id
+        bridge_lines = payments.mapped('move_line_ids').filtered(lambda l: l.account_id == bridge_account)
+        failing_lines = failing_payments.mapped('move_line_ids').filtered(lambda l: l.account_id == bridge_account)
+        # The batch of the first journal fails alone
+        journals[0].default_debit_account_id.deprecated = True
+        moves = self.env['account.journal']._cron_collect_matured_pagares(
+            date=max(bridge_lines.mapped('date_maturity')), batch_size=10)
+        self.assertEqual(moves.mapped('journal_id'), journals[1])
+        self.assertFalse(any(failing_lines.mapped('reconciled')))
+        self.assertTrue(all(bridge_lines.mapped('reconciled')))
+        # Each line is reconciled with counterparts of its own partner, on a receivable bridge account
+        for line in bridge_lines:
+            counterparts = line.matched_credit_ids.mapped('credit_move_id')
+            self.assertEqual(counterparts.mapped('partner_id'), line.partner_id)
+
+    def test_14b_collect_partly_reconciled_pagares(self):
+        journal = self._create_journals(1)
+        bridge_account = journal.pagare_inbound_bridge_account_id = self.env['account.account'].create({
+            'name': 'Received pagares',
+            'code': 'PBRIDGE',
+            'user_type_id': self.env.ref('account.data_account_type_current_assets').id,
+            'reconcile': True,
+            'company_id': self.company.id,
+        })
+        invoices = self._create_invoices(self._create_partners(1), invoice_type='out_invoice')
+        payment = self._register_payments(invoices, journal, payment_method=self.method_inbound)
+        bridge_line = payment.move_line_ids.filtered(lambda l: l.account_id == bridge_account)
+        # Part of the pagare was already settled
+        settled = self.env['account.move'].create({
+            'journal_id': journal.id,
+            'date': self.today,
+            'line_ids': [
+                (0, 0, {'name': 'Settled', 'account_id': bridge_account.id,
+                        'partner_id': bridge_line.partner_id.id, 'credit': 40.0}),
+                (0, 0, {'name': 'Settled', 'account_id': self.account_expense.id, 'debit': 40.0}),
+            ],
+        })
+        settled.post()
+        (bridge_line + settled.line_ids.filtered(lambda l: l.account_id == bridge_account)).reconcile()
+        residual = bridge_line.amount_residual
+        self.assertEqual(residual, bridge_line.debit - 40.0)
+        moves = self.env['account.journal']._cron_collect_matured_pagares(date=bridge_line.date_maturity)
+        self.assertEqual(len(moves), 1)
+        bank_line = moves.line_ids.filtered(lambda l: l.account_id == journal.default_debit_account_id)
+        self.assertEqual((bank_line.debit, bank_line.credit), (residual, 0.0))
+        self.assertTrue(bridge_line.reconciled)
+        self.assertFalse(moves.line_ids.filtered(lambda l: l.account_id == bridge_account).amount_residual)
+
+    def test_15_pdf_cache(self):
+        payments = self._create_pagares(2, self._create_journals(1), multi_currency=False)
+        report = self.env['ir.actions.report']._get_report_from_name(self.layout.report)
+        report = report.with_context(pagare_pdf_cache=True)
+        rendered = []
+
+        def render(report_self, res_ids, data=None):
+            rendered.append(list(res_ids))
+            return _blank_pdf(len(res_ids)), 'pdf'
+
+        with patch.object(type(report), '_render_pagare_documents', render):
+            report.render_qweb_pdf(payments[0].ids)
+            self.assertEqual(rendered, [payments[0].ids])
+            # Hit
+            report.render_qweb_pdf(payments[0].ids)
+            self.assertEqual(len(rendered), 1)
+            # Only the missing pagare is rendered, the document keeps the requested order
+            pdf, report_format = report.render_qweb_pdf(payments.ids)
+            self.assertEqual(report_format, 'pdf')
+            self.assertEqual(rendered[-1], payments[1].ids)
+            self.assertEqual(PdfFileReader(io.BytesIO(pdf)).getNumPages(), 2)
+            self.assertEqual(len(rendered), 2)
+            # A change of the payment invalidates its document
+            payments[0].communication = 'Pagare bench changed'
+            report.render_qweb_pdf(payments.ids)
+            self.assertEqual(rendered[-1], payments[0].ids)
+            # A change of the layout clears the cache
+            self.layout.write({'report': self.layout.report})
+            report.render_qweb_pdf(payments[1].ids)
+            self.assertEqual(rendered[-1], payments[1].ids)
+        # The cache is off in the tests unless it is enabled
+        self.assertFalse(self.env['ir.actions.report'].browse(report.id)._use_pagare_pdf_cache())
+        self.assertTrue(report._use_pagare_pdf_cache())
+
+    def test_16_print_job(self):
+        journal = self._create_journals(1, manual_sequencing=True)
+        journal.pagare_print_chunk_size = 2
+        payments = self._create_pagares(5, journal, multi_currency=False)
+        action = payments.print_pagares()
+        job = self.env['account.payment.pagare.print.job'].browse(action['res_id'])
+        self.assertEqual(job.state, 'pending')
+        self.assertEqual(job.chunk_count, 3)
+        # The chunks follow the pagare numbers
+        chunks = job._get_print_chunks()
+        self.assertEqual([ids for report_name, ids in chunks],
+                         [payments.sorted('pagare_number')[i:i + 2].ids for i in (0, 2, 4)])
+        report_class = type(self.env['ir.actions.report'])
+        rendered = []
+
+        def render(report_self, res_ids=None, data=None):
+            rendered.append(list(res_ids))
+            return _blank_pdf(len(res_ids)), 'pdf'
+
+        with patch.object(report_class, 'render_qweb_pdf', render):
+            self.env['account.payment.pagare.print.job']._cron_process_print_jobs()
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(job.chunk_done, 3)
+        self.assertEqual(rendered, [ids for report_name, ids in chunks])
+        pdf = base64.b64decode(job.attachment_id.datas)
+        self.assertEqual(PdfFileReader(io.BytesIO(pdf)).getNumPages(), 5)
+        self.assertEqual(job.action_download()['type'], 'ir.actions.act_url')
+
+        # A failing render is recorded on the job, which can be retried
+        job = self.env['account.payment.pagare.print.job'].create_from_payments(payments, 2)
+
+        def fail(report_self, res_ids=None, data=None):
+            raise Exception('wkhtmltopdf failed')
+
+        with patch.object(report_class, 'render_qweb_pdf', fail):
+            job.run()
+        self.assertEqual(job.state, 'failed')
+        self.assertIn('wkhtmltopdf failed', job.error)
+        self.assertFalse(job.attachment_id)
+        job.action_retry()
+        self.assertEqual(job.state, 'pending')
+
+        # A job left running by a crashed worker is rendered again once it is stale
+        job.write({'state': 'running'})
+        job.action_retry()
+        self.assertEqual(job.state, 'running')
+        with patch.object(report_class, 'render_qweb_pdf', render):
+            self.env['account.payment.pagare.print.job']._cron_process_print_jobs()
+        self.assertEqual(job.state, 'running')
+        self.env.cr.execute("UPDATE account_payment_pagare_print_job SET write_date = write_date - interval '2 hours' "
+                            "WHERE id = %s", (job.id,))
+        job.invalidate_cache()
+        stale_job = job.copy({'name': 'Stale'})
+        self.env.cr.execute("UPDATE account_payment_pagare_print_job SET state = 'running', "
+                            "write_date = write_date - interval '2 hours' WHERE id = %s", (stale_job.id,))
+        stale_job.invalidate_cache()
+        stale_job.action_retry()
+        self.assertEqual(stale_job.state, 'pending')
+        with patch.object(report_class, 'render_qweb_pdf', render):
+            self.env['account.payment.pagare.print.job']._cron_process_print_jobs()
+        self.assertEqual((job + stale_job).mapped('state'), ['done', 'done'])
+
+    def test_17_enable_pagare_printing_on_bank_journals(self):
+        journals = self._create_journals(3)
+        configured = self._create_journals(1)
+        journals._remove_pagare_payment_methods()
+        configured._remove_pagare_payment_methods()
+        self.env.cr.execute("UPDATE account_journal SET pagare_sequence_id = NULL WHERE id IN %s",
+                            (tuple(journals.ids),))
+        journals.invalidate_cache()
+        self.env['account.journal']._enable_pagare_printing_on_bank_journals()
+        journals.invalidate_cache()
+        for journal in journals:
+            self.assertEqual(journal.pagare_sequence_id.implementation, 'no_gap')
+            self.assertEqual(journal.pagare_sequence_id.name, journal.name + ': Pagare Number Sequence')
+            self.assertEqual(journal.pagare_sequence_id.company_id, journal.company_id)
+            self.assertEqual(journal.pagare_next_number, 1)
+            self.assertIn(self.method_outbound, journal.outbound_payment_method_ids)
+            self.assertIn(self.method_inbound, journal.inbound_payment_method_ids)
+            self.assertTrue(journal.pagare_printing_outbound_payment_method_selected)
+            self.assertTrue(journal.pagare_printing_inbound_payment_method_selected)
+        self.assertEqual(len(journals.mapped('pagare_sequence_id')), 3)
+        # A journal already configured keeps the payment methods chosen by the user
+        self.assertNotIn(self.method_outbound, configured.outbound_payment_method_ids)
+        # Running it again, as on a module update, changes nothing
+        journals._add_pagare_payment_methods()
+        field = self.env['account.journal']._fields['outbound_payment_method_ids']
+        self.env.cr.execute("""
+            SELECT COUNT(*) FROM {relation} WHERE {column1} IN %s AND {column2} = %s
+        """.format(relation=field.relation, column1=field.column1, column2=field.column2),
+            (tuple(journals.ids), self.method_outbound.id))
+        self.assertEqual(self.env.cr.fetchone()[0], 3)
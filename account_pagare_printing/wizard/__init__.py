@@ -4,3 +4,5 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 from . import print_prenumbered_pagares
+from . import issue_pagares
+from . import export_pagares
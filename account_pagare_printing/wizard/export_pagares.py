@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import base64
+import csv
+import hashlib
+import io
+import os
+import tempfile
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+# Number of payments fetched at once from the server-side cursor
+EXPORT_FETCH_SIZE = 2000
+# Size of the blocks written to the filestore
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+class ExportPagares(models.TransientModel):
+    _name = 'export.pagares'
+    _description = 'Export Emitted Pagares'
+
+    journal_id = fields.Many2one('account.journal', string='Bank Journal', required=True,
+                                 domain=[('pagare_printing_outbound_payment_method_selected', '=', True)])
+    date_from = fields.Date(string='From', required=True)
+    date_to = fields.Date(string='To', required=True, default=fields.Date.context_today)
+    file_format = fields.Selection([('csv', 'CSV'), ('fixed', 'Fixed width')], string='Format',
+                                   required=True, default='csv')
+
+    def _iter_rows(self):
+        """ Yield the emitted pagares of the journal and period as tuples
+            (number, due date, amount, currency, currency id, amount in words, beneficiary, vat),
+            reading them from a server-side cursor so that they are never all in memory.
+        """
+        cr = self.env.cr
+        cr.execute("""
+            DECLARE pagare_export NO SCROLL CURSOR FOR
+             SELECT payment.pagare_number, payment.pagare_due_date, payment.amount, currency.name,
+                    currency.id, payment.pagare_amount_in_words, partner.name, partner.vat
+               FROM account_payment payment
+               JOIN res_partner partner ON partner.id = payment.partner_id
+               JOIN res_currency currency ON currency.id = payment.currency_id
+              WHERE payment.journal_id = %s
+                AND payment.pagare_direction = 'outbound'
+                AND payment.state IN ('posted', 'sent', 'reconciled')
+                AND payment.payment_date BETWEEN %s AND %s
+           ORDER BY payment.pagare_number, payment.id
+        """, (self.journal_id.id, self.date_from, self.date_to))
+        try:
+            while True:
+                cr.execute("FETCH FORWARD %s FROM pagare_export", (EXPORT_FETCH_SIZE,))
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            cr.execute("CLOSE pagare_export")
+
+    def _iter_records(self):
+        """ Yield the values of each exported pagare, in the order of the file columns """
+        words = self.env['account.pagare.amount.words']
+        currencies = {}
+        for number, due_date, amount, currency_name, currency_id, amount_in_words, name, vat in self._iter_rows():
+            if not amount_in_words:
+                if currency_id not in currencies:
+                    currencies[currency_id] = self.env['res.currency'].browse(currency_id)
+                amount_in_words = words.amount_to_words(currencies[currency_id], amount)
+            yield (number, due_date and fields.Date.to_string(due_date) or '', amount, currency_name,
+                   amount_in_words or '', name or '', vat or '')
+
+    def _iter_csv_lines(self, records):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';')
+        writer.writerow(['number', 'due_date', 'amount', 'currency', 'amount_in_words', 'beneficiary', 'vat'])
+        for record in records:
+            writer.writerow(['%d' % record[0], record[1], '%.2f' % record[2]] + list(record[3:]))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    def _iter_fixed_lines(self, records):
+        """ One line per pagare: number (10), due date YYYYMMDD (8), amount in cents (15),
+            currency (3), beneficiary vat (20), beneficiary (40), amount in words (170).
+        """
+        for number, due_date, amount, currency_name, amount_in_words, name, vat in records:
+            yield ''.join([
+                str(number).rjust(10, '0')[:10],
+                due_date.replace('-', '').ljust(8)[:8],
+                str(int(round(amount * 100))).rjust(15, '0')[:15],
+                currency_name.ljust(3)[:3],
+                vat.ljust(20)[:20],
+                name.ljust(40)[:40],
+                amount_in_words.ljust(170)[:170],
+            ]) + '\r\n'
+
+    def _write_attachment(self, lines, filename, mimetype):
+        """ Write the lines in chunks of EXPORT_CHUNK_SIZE bytes straight into the filestore,
+            computing the checksum as they are written, and attach the file to the journal.
+            With the attachments stored in the database the file is attached from its content.
+        """
+        Attachment = self.env['ir.attachment'].sudo()
+        values = {
+            'name': filename,
+            'datas_fname': filename,
+            'res_model': 'account.journal',
+            'res_id': self.journal_id.id,
+            'mimetype': mimetype,
+        }
+        if Attachment._storage() != 'file':
+            values['datas'] = base64.b64encode(''.join(lines).encode('utf-8'))
+            return Attachment.create(values)
+        sha = hashlib.sha1()
+        size = 0
+        tmp = tempfile.NamedTemporaryFile(dir=Attachment._filestore(), prefix='.pagare_export_', delete=False)
+        try:
+            with tmp:
+                chunk = []
+                chunk_size = 0
+                for line in lines:
+                    data = line.encode('utf-8')
+                    chunk.append(data)
+                    chunk_size += len(data)
+                    if chunk_size >= EXPORT_CHUNK_SIZE:
+                        size += self._write_chunk(tmp, sha, chunk)
+                        chunk, chunk_size = [], 0
+                size += self._write_chunk(tmp, sha, chunk)
+            checksum = sha.hexdigest()
+            fname, full_path = Attachment._get_path(None, checksum)
+            if os.path.exists(full_path):
+                os.unlink(tmp.name)
+            else:
+                os.rename(tmp.name, full_path)
+                # Removed by the garbage collector if the transaction is rolled back
+                Attachment._mark_for_gc(fname)
+        except Exception:
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+            raise
+        values['store_fname'] = fname
+        attachment = Attachment.create(values)
+        # create() drops the size and checksum, which are computed from the datas
+        self.env.cr.execute("UPDATE ir_attachment SET file_size = %s, checksum = %s WHERE id = %s",
+                            (size, checksum, attachment.id))
+        attachment.invalidate_cache(['file_size', 'checksum'], attachment.ids)
+        return attachment
+
+    @staticmethod
+    def _write_chunk(tmp, sha, chunk):
+        data = b''.join(chunk)
+        tmp.write(data)
+        sha.update(data)
+        return len(data)
+
+    @api.multi
+    def export_pagares(self):
+        self.ensure_one()
+        if self.date_from > self.date_to:
+            raise UserError(_("The start date must be before the end date."))
+        records = self._iter_records()
+        if self.file_format == 'fixed':
+            lines, extension, mimetype = self._iter_fixed_lines(records), 'txt', 'text/plain'
+        else:
+            lines, extension, mimetype = self._iter_csv_lines(records), 'csv', 'text/csv'
+        filename = '%s_%s_%s.%s' % (self.journal_id.code, self.date_from, self.date_to, extension)
+        attachment = self._write_attachment(lines, filename, mimetype)
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/web/content/%s?download=true' % attachment.id,
+            'target': 'self',
+        }
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+
+class IssuePagares(models.TransientModel):
+    _name = 'issue.pagares'
+    _description = 'Issue Pagares'
+
+    journal_id = fields.Many2one('account.journal', string='Bank Journal', required=True,
+                                 domain=[('pagare_printing_outbound_payment_method_selected', '=', True)])
+    payment_date = fields.Date(string='Payment Date', required=True, default=fields.Date.context_today)
+    date_due_from = fields.Date(string='Due From')
+    date_due_to = fields.Date(string='Due To', required=True, default=fields.Date.context_today)
+    partner_ids = fields.Many2many('res.partner', string='Vendors',
+                                   help="Leave empty to pay the invoices of all the vendors.")
+    batch_size = fields.Integer(string='Batch Size', required=True, default=500,
+                                help="Number of pagares posted at once.")
+
+    def _get_invoices_domain(self):
+        domain = [
+            ('type', 'in', ('in_invoice', 'in_refund')),
+            ('state', '=', 'open'),
+            ('company_id', '=', self.journal_id.company_id.id),
+            ('date_due', '<=', self.date_due_to),
+        ]
+        if self.date_due_from:
+            domain.append(('date_due', '>=', self.date_due_from))
+        if self.partner_ids:
+            domain.append(('commercial_partner_id', 'in', self.partner_ids.mapped('commercial_partner_id').ids))
+        return domain
+
+    def _group_invoices(self, invoices):
+        """ Return {(commercial partner id, currency id): invoices}, one group per pagare """
+        groups = {}
+        for invoice in invoices:
+            key = (invoice.commercial_partner_id.id, invoice.currency_id.id)
+            groups.setdefault(key, []).append(invoice.id)
+        return {key: self.env['account.invoice'].browse(ids) for key, ids in groups.items()}
+
+    def _prepare_payments_vals(self, groups, payment_method):
+        words = self.env['account.pagare.amount.words']
+        payments_vals = []
+        for (partner_id, currency_id), invoices in sorted(groups.items()):
+            amount = sum(-inv.residual if inv.type == 'in_refund' else inv.residual for inv in invoices)
+            currency = invoices[0].currency_id
+            if currency.compare_amounts(amount, 0.0) <= 0:
+                continue
+            payments_vals.append({
+                'journal_id': self.journal_id.id,
+                'payment_method_id': payment_method.id,
+                'payment_date': self.payment_date,
+                'communication': ' '.join(inv.reference or inv.number for inv in invoices),
+                'invoice_ids': [(6, 0, invoices.ids)],
+                'payment_type': 'outbound',
+                'amount': amount,
+                'currency_id': currency_id,
+                'partner_id': partner_id,
+                'partner_type': 'supplier',
+                'pagare_due_date': min(invoices.mapped('date_due')),
+                'pagare_amount_in_words': words.amount_to_words(currency, amount),
+            })
+        return payments_vals
+
+    @api.multi
+    def issue_pagares(self):
+        """ Create and post one emitted pagare per vendor and currency for the open invoices
+            due in the selected window.
+
+            The numbers of the whole run are reserved at once, and each batch is posted with a
+            single call to the standard post(), which checks and names its pagares together.
+            The moves are still created by post(), one per pagare, so that the overrides of
+            post() and _create_payment_entry() of other modules apply.
+        """
+        self.ensure_one()
+        payment_method = self.journal_id.outbound_payment_method_ids.filtered(
+            lambda m: m.code == 'pagare_printing')
+        if not payment_method:
+            raise UserError(_("The journal %s does not allow to emit pagares.") % self.journal_id.name)
+        invoices = self.env['account.invoice'].search(self._get_invoices_domain(), order='date_due, id')
+        payments_vals = self._prepare_payments_vals(self._group_invoices(invoices), payment_method[0])
+        if not payments_vals:
+            raise UserError(_("There is no invoice to pay with pagares in the selected period."))
+        if self.journal_id.pagare_manual_sequencing:
+            # Allocate the numbers of the whole run at once
+            numbers = self.journal_id._reserve_pagare_numbers(len(payments_vals))
+            for vals, number in zip(payments_vals, numbers):
+                vals['pagare_number'] = number
+        payments = self.env['account.payment']
+        batch_size = max(self.batch_size, 1)
+        for index in range(0, len(payments_vals), batch_size):
+            batch = self.env['account.payment']
+            for vals in payments_vals[index:index + batch_size]:
+                batch += self.env['account.payment'].create(vals)
+            batch.post()
+            payments += batch
+        return {
+            'name': _('Issued Pagares'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.payment',
+            'view_type': 'form',
+            'view_mode': 'tree,form',
+            'domain': [('id', 'in', payments.ids)],
+            'context': {'default_payment_type': 'outbound'},
+        }
@@ -4,21 +4,40 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 from odoo import api, fields, models
+from odoo.addons.account_pagare_printing.models.account_pagare_stats import measure_stage
 
 
 class PrintPreNumberedPagares(models.TransientModel):
     _name = 'print.prenumbered.pagares'
     _description = 'Print Pre-numbered Pagares'
 
-    next_pagare_number = fields.Integer('Next Pagare Number', required=True)
+    line_ids = fields.One2many('print.prenumbered.pagares.line', 'wizard_id', string='Journals')
 
     @api.multi
+    @measure_stage('prenumbered_print_pagares',
+                   lambda self: self.env['account.payment'].browse(self.env.context.get('payment_ids', [])))
     def print_pagares(self):
-        pagare_number = self.next_pagare_number
         payments = self.env['account.payment'].browse(self.env.context['payment_ids'])
+        # Serialize the prints of the journals and make sure no other payment uses these numbers
+        journal_payments = []
+        for line in self.line_ids:
+            payments_of_journal = payments.filtered(lambda r: r.journal_id == line.journal_id)
+            line.journal_id._lock_pagare_last_number()
+            line.journal_id._check_pagare_numbers_available(
+                line.next_pagare_number, len(payments_of_journal), payments_of_journal)
+            journal_payments.append((payments_of_journal, line.next_pagare_number))
         payments.filtered(lambda r: r.state == 'draft').post()
         payments.filtered(lambda r: r.state not in ('sent', 'cancelled')).write({'state': 'sent'})
-        for payment in payments:
-            payment.set_pagare_number_from_printing(pagare_number)
-            pagare_number += 1
+        for payments_of_journal, pagare_number in journal_payments:
+            payments_of_journal._set_pagare_numbers_from_printing(pagare_number)
         return payments.do_print_pagares()
+
+
+class PrintPreNumberedPagaresLine(models.TransientModel):
+    _name = 'print.prenumbered.pagares.line'
+    _description = 'Print Pre-numbered Pagares of a Journal'
+
+    wizard_id = fields.Many2one('print.prenumbered.pagares', required=True, ondelete='cascade')
+    journal_id = fields.Many2one('account.journal', string='Journal', required=True, readonly=True)
+    payment_count = fields.Integer(string='Pagares', readonly=True)
+    next_pagare_number = fields.Integer('Next Pagare Number', required=True)
@@ -1,3 +1,5 @@
 # Copyright 2019 Fenix Engineering Solutions
 # @author Jose F. Fernandez
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from . import models
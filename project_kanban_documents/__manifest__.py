@@ -15,6 +15,7 @@
     ],
     'depends': ['project', ],
     'data': [
+        'data/project_kanban_documents_data.xml',
         'views/project_inherit.xml',
     ],
     'demo': [
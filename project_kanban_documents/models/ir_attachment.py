@@ -0,0 +1,57 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+PROJECT_MODELS = ('project.project', 'project.task')
+
+
+class IrAttachment(models.Model):
+    _inherit = 'ir.attachment'
+
+    def _get_project_doc_counts(self):
+        """ Return {project id: number of attachments of self} for the documents of the projects
+            and of their tasks.
+        """
+        if not self.ids:
+            return {}
+        self.env.cr.execute("""
+            SELECT COALESCE(task.project_id, CASE WHEN att.res_model = 'project.project'
+                                                  THEN att.res_id END) AS project_id,
+                   COUNT(*)
+              FROM ir_attachment att
+         LEFT JOIN project_task task ON att.res_model = 'project.task' AND task.id = att.res_id
+             WHERE att.id IN %s AND att.res_model IN %s AND att.res_field IS NULL
+          GROUP BY 1
+        """, (tuple(self.ids), PROJECT_MODELS))
+        return {project_id: count for project_id, count in self.env.cr.fetchall() if project_id}
+
+    @api.model
+    def create(self, vals):
+        attachment = super(IrAttachment, self).create(vals)
+        # The document may be linked to its record by the default_res_model/default_res_id context
+        if attachment.res_model in PROJECT_MODELS and attachment.res_id and not attachment.res_field:
+            self.env['project.project']._update_stored_doc_count(attachment._get_project_doc_counts())
+        return attachment
+
+    @api.multi
+    def write(self, vals):
+        moved = {'res_model', 'res_id', 'res_field'} & set(vals)
+        if moved:
+            old_counts = self._get_project_doc_counts()
+        res = super(IrAttachment, self).write(vals)
+        if moved:
+            deltas = self._get_project_doc_counts()
+            for project_id, count in old_counts.items():
+                deltas[project_id] = deltas.get(project_id, 0) - count
+            self.env['project.project']._update_stored_doc_count(deltas)
+        return res
+
+    @api.multi
+    def unlink(self):
+        counts = self._get_project_doc_counts()
+        res = super(IrAttachment, self).unlink()
+        self.env['project.project']._update_stored_doc_count(
+            {project_id: -count for project_id, count in counts.items()})
+        return res
@@ -0,0 +1,120 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+from odoo.tools.sql import column_exists, create_column
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class Project(models.Model):
+    _inherit = 'project.project'
+
+    stored_doc_count = fields.Integer(string="Stored number of documents", readonly=True, copy=False,
+                                      help="Technical field kept up to date by the attachments of the project "
+                                           "and its tasks.")
+
+    @api.model_cr_context
+    def _auto_init(self):
+        # Create and fill the counter in SQL, so that the ORM does not compute it project by project
+        if not column_exists(self.env.cr, self._table, 'stored_doc_count'):
+            create_column(self.env.cr, self._table, 'stored_doc_count', 'int4')
+            self._recompute_stored_doc_count()
+        return super(Project, self)._auto_init()
+
+    def _compute_attached_docs_count(self):
+        for project in self:
+            project.doc_count = project.stored_doc_count
+
+    @api.multi
+    def attachment_tree_view(self):
+        # Open the documents of all the tasks of the project, archived or in folded stages
+        # included, the ones counted by stored_doc_count
+        action = super(Project, self).attachment_tree_view()
+        tasks = self.env['project.task'].with_context(active_test=False).search([('project_id', 'in', self.ids)])
+        action['domain'] = [
+            '|',
+            '&', ('res_model', '=', 'project.project'), ('res_id', 'in', self.ids),
+            '&', ('res_model', '=', 'project.task'), ('res_id', 'in', tasks.ids),
+        ]
+        return action
+
+    @api.model
+    def _update_stored_doc_count(self, deltas):
+        """ Add the given number of documents to the stored counters of the projects
+
+            :param deltas: dict mapping project ids to the number of attachments added (or removed if negative)
+        """
+        deltas = {project_id: delta for project_id, delta in deltas.items() if project_id and delta}
+        if not deltas:
+            return
+        self.env.cr.execute("""
+            UPDATE project_project project
+               SET stored_doc_count = GREATEST(COALESCE(project.stored_doc_count, 0) + vals.delta, 0)
+              FROM unnest(%s::int[], %s::int[]) AS vals(id, delta)
+             WHERE project.id = vals.id
+        """, (list(deltas), list(deltas.values())))
+        self.invalidate_cache(['stored_doc_count', 'doc_count'], list(deltas))
+
+    @api.model
+    def _recompute_stored_doc_count(self):
+        """ Rebuild the stored counters of all the projects in one statement """
+        self.env.cr.execute("""
+            UPDATE project_project project
+               SET stored_doc_count = COALESCE(attachment.doc_count, 0)
+              FROM project_project all_project
+         LEFT JOIN (SELECT COALESCE(task.project_id, CASE WHEN att.res_model = 'project.project'
+                                                          THEN att.res_id END) AS project_id,
+                           COUNT(*) AS doc_count
+                      FROM ir_attachment att
+                 LEFT JOIN project_task task ON att.res_model = 'project.task' AND task.id = att.res_id
+                     WHERE att.res_model IN ('project.project', 'project.task') AND att.res_field IS NULL
+                  GROUP BY 1) attachment ON attachment.project_id = all_project.id
+             WHERE project.id = all_project.id
+               AND project.stored_doc_count IS DISTINCT FROM COALESCE(attachment.doc_count, 0)
+        """)
+        _logger.info("Recomputed the stored document counters of %d projects", self.env.cr.rowcount)
+        self.invalidate_cache(['stored_doc_count', 'doc_count'])
+
+
+class ProjectTask(models.Model):
+    _inherit = 'project.task'
+
+    def _get_project_doc_counts(self):
+        """ Return {project id: number of attachments of the tasks of self in the project} """
+        if not self.ids:
+            return {}
+        self.env.cr.execute("""
+            SELECT task.project_id, COUNT(*)
+              FROM ir_attachment att
+              JOIN project_task task ON task.id = att.res_id
+             WHERE att.res_model = 'project.task' AND att.res_field IS NULL
+               AND task.id IN %s AND task.project_id IS NOT NULL
+          GROUP BY task.project_id
+        """, (tuple(self.ids),))
+        return dict(self.env.cr.fetchall())
+
+    @api.multi
+    def write(self, vals):
+        if 'project_id' not in vals:
+            return super(ProjectTask, self).write(vals)
+        # Move the documents of the tasks to the counter of their new project
+        old_counts = self._get_project_doc_counts()
+        res = super(ProjectTask, self).write(vals)
+        deltas = self._get_project_doc_counts()
+        for project_id, count in old_counts.items():
+            deltas[project_id] = deltas.get(project_id, 0) - count
+        self.env['project.project']._update_stored_doc_count(deltas)
+        return res
+
+    @api.multi
+    def unlink(self):
+        # The attachments are deleted after the tasks, when their project is no longer known
+        counts = self._get_project_doc_counts()
+        res = super(ProjectTask, self).unlink()
+        self.env['project.project']._update_stored_doc_count(
+            {project_id: -count for project_id, count in counts.items()})
+        return res
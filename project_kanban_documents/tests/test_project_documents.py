@@ -0,0 +1,93 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import base64
+
+from odoo.tests.common import TransactionCase
+
+
+class TestProjectDocuments(TransactionCase):
+
+    def setUp(self):
+        super(TestProjectDocuments, self).setUp()
+        self.projects = self.env['project.project']
+        for name in ('First', 'Second'):
+            self.projects += self.env['project.project'].create({'name': name})
+        self.folded_stage = self.env['project.task.type'].create({
+            'name': 'Folded',
+            'fold': True,
+            'project_ids': [(6, 0, self.projects.ids)],
+        })
+        self.task = self._create_task('Open')
+        self.folded_task = self._create_task('Folded', stage_id=self.folded_stage.id)
+        self.archived_task = self._create_task('Archived', active=False)
+
+    def _create_task(self, name, **values):
+        vals = {'name': name, 'project_id': self.projects[0].id}
+        vals.update(values)
+        return self.env['project.task'].create(vals)
+
+    def _attach(self, record, name, **values):
+        vals = {
+            'name': name,
+            'datas': base64.b64encode(b'document'),
+            'res_model': record._name,
+            'res_id': record.id,
+        }
+        vals.update(values)
+        return self.env['ir.attachment'].create(vals)
+
+    def _check_counts(self, counts):
+        """ Check the stored counters against the documents the kanban button opens """
+        self.projects.invalidate_cache(['stored_doc_count', 'doc_count'])
+        self.assertEqual(self.projects.mapped('doc_count'), counts)
+        for project, count in zip(self.projects, counts):
+            action = project.attachment_tree_view()
+            self.assertEqual(self.env['ir.attachment'].search_count(action['domain']), count)
+
+    def test_01_attachment_hooks(self):
+        self._attach(self.projects[0], 'Project')
+        document = self._attach(self.task, 'Task')
+        self._attach(self.folded_task, 'Folded')
+        self._attach(self.archived_task, 'Archived')
+        # Binary fields are not documents
+        self._attach(self.task, 'Field', res_field='description')
+        # Linked by the context defaults of the attachments action
+        self.env['ir.attachment'].with_context(default_res_model='project.project',
+                                               default_res_id=self.projects[1].id).create({
+            'name': 'Default',
+            'datas': base64.b64encode(b'document'),
+        })
+        self._check_counts([4, 1])
+        document.write({'res_model': 'project.project', 'res_id': self.projects[1].id})
+        self._check_counts([3, 2])
+        document.write({'res_id': self.projects[0].id})
+        self._check_counts([4, 1])
+        document.unlink()
+        self._check_counts([3, 1])
+
+    def test_02_task_hooks(self):
+        self._attach(self.task, 'One')
+        self._attach(self.task, 'Two')
+        self._attach(self.archived_task, 'Archived')
+        self._check_counts([3, 0])
+        self.task.write({'project_id': self.projects[1].id})
+        self._check_counts([1, 2])
+        # The attachments of a deleted task are removed with it
+        self.task.unlink()
+        self._check_counts([1, 0])
+        self.archived_task.unlink()
+        self._check_counts([0, 0])
+
+    def test_03_recompute(self):
+        self._attach(self.projects[0], 'Project')
+        self._attach(self.folded_task, 'Folded')
+        self._attach(self.projects[1], 'Second')
+        self.env.cr.execute("UPDATE project_project SET stored_doc_count = 7 WHERE id IN %s",
+                            (tuple(self.projects.ids),))
+        self.env.ref('project_kanban_documents.action_recompute_project_doc_count').run()
+        self._check_counts([2, 1])
+        self.assertEqual(self.projects.mapped('stored_doc_count'), [
+            self.env['ir.attachment'].search_count(project.attachment_tree_view()['domain'])
+            for project in self.projects])
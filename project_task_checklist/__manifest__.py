@@ -18,6 +18,8 @@
         'security/ir.model.access.csv',
         'security/security.xml',
         'views/project_inherit.xml',
+        'views/checklist_template_views.xml',
+        'wizard/apply_checklist_template_views.xml',
     ],
     'demo': [
     ],
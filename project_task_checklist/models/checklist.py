@@ -19,3 +19,27 @@ class ProjectTaskChecklistItem(models.Model):
     company_id = fields.Many2one(related='task_id.company_id', string='Company', store=True, readonly=True)
     name = fields.Char(string='Name', required=True)
     checked = fields.Boolean('Checked')
+
+
+class ProjectTaskChecklistTemplate(models.Model):
+    _name = 'project_task_checklist.template'
+    _description = 'Task Checklist Template'
+    _order = 'name, id'
+
+    name = fields.Char(string='Name', required=True)
+    active = fields.Boolean(default=True)
+    company_id = fields.Many2one('res.company', string='Company',
+                                 default=lambda self: self.env['res.company']._company_default_get())
+    item_ids = fields.One2many('project_task_checklist.template.item', 'template_id', string='Checklist elements',
+                               copy=True)
+
+
+class ProjectTaskChecklistTemplateItem(models.Model):
+    _name = 'project_task_checklist.template.item'
+    _description = 'Task Checklist Template Item'
+    _order = 'sequence, id'
+
+    sequence = fields.Integer(default=10)
+    template_id = fields.Many2one('project_task_checklist.template', string='Template', required=True,
+                                  index=True, ondelete='cascade')
+    name = fields.Char(string='Name', required=True)
@@ -3,14 +3,219 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
 
 from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools.sql import column_exists, create_column
 
 import logging
 
 _logger = logging.getLogger(__name__)
 
 
+class ProjectTaskType(models.Model):
+    _inherit = 'project.task.type'
+
+    checklist_required = fields.Boolean(string='Checklist required',
+                                        help="Tasks can only be moved to this stage when all the elements "
+                                             "of their checklist are checked.")
+
+
 class ProjectTask(models.Model):
     _inherit = 'project.task'
 
     checklist_name = fields.Char(string='Checklist name')
-    checklist_item_ids = fields.One2many('project_task_checklist.item', 'task_id', string='Checklist elements', copy=True)
+    # The elements are copied in bulk by _copy_checklist_items
+    checklist_item_ids = fields.One2many('project_task_checklist.item', 'task_id', string='Checklist elements')
+    checklist_total = fields.Integer(string='Checklist elements count', compute='_compute_checklist_progress',
+                                     store=True)
+    checklist_done = fields.Integer(string='Checked elements count', compute='_compute_checklist_progress',
+                                    store=True)
+    checklist_progress = fields.Float(string='Checklist progress', compute='_compute_checklist_progress',
+                                      store=True, group_operator='avg',
+                                      help="Percentage of checked elements of the checklist.")
+
+    @api.model_cr_context
+    def _auto_init(self):
+        # Create and fill the counters in SQL, so that the ORM does not compute them task by task
+        if not column_exists(self.env.cr, self._table, 'checklist_total'):
+            create_column(self.env.cr, self._table, 'checklist_total', 'int4')
+            create_column(self.env.cr, self._table, 'checklist_done', 'int4')
+            create_column(self.env.cr, self._table, 'checklist_progress', 'float8')
+            self._recompute_checklist_progress()
+        return super(ProjectTask, self)._auto_init()
+
+    @api.depends('checklist_item_ids', 'checklist_item_ids.checked')
+    def _compute_checklist_progress(self):
+        # Count the elements of all the tasks with one grouped query
+        counts = {}
+        task_ids = [task_id for task_id in self.ids if task_id]
+        if task_ids:
+            groups = self.env['project_task_checklist.item'].sudo().read_group(
+                [('task_id', 'in', task_ids)], ['task_id', 'checked'], ['task_id', 'checked'], lazy=False)
+            for group in groups:
+                task_id = group['task_id'][0]
+                total, done = counts.get(task_id, (0, 0))
+                counts[task_id] = (total + group['__count'], done + (group['__count'] if group['checked'] else 0))
+        for task in self:
+            if task.id:
+                total, done = counts.get(task.id, (0, 0))
+            else:
+                # Onchange of a new task, the elements are only in memory
+                total, done = len(task.checklist_item_ids), len(task.checklist_item_ids.filtered('checked'))
+            task.checklist_total = total
+            task.checklist_done = done
+            task.checklist_progress = 100.0 * done / total if total else 0.0
+
+    @api.model
+    def _recompute_checklist_progress(self, task_ids=None):
+        """ Refresh in one statement the stored checklist counters of the tasks whose elements
+            were written in SQL, all the tasks if task_ids is None.
+        """
+        where, params = '', []
+        if task_ids is not None:
+            if not task_ids:
+                return
+            where, params = 'AND task.id IN %s', [tuple(task_ids)]
+        self.env.cr.execute("""
+            UPDATE project_task task
+               SET checklist_total = COALESCE(item.total, 0),
+                   checklist_done = COALESCE(item.done, 0),
+                   checklist_progress = COALESCE(100.0 * item.done / item.total, 0)
+              FROM project_task all_task
+         LEFT JOIN (SELECT task_id, COUNT(*) AS total, COUNT(*) FILTER (WHERE checked) AS done
+                      FROM project_task_checklist_item
+                  GROUP BY task_id) item ON item.task_id = all_task.id
+             WHERE task.id = all_task.id %s
+        """ % where, params)
+        self.invalidate_cache(['checklist_total', 'checklist_done', 'checklist_progress', 'checklist_item_ids'],
+                              task_ids)
+
+    @api.model
+    def _copy_checklist_items(self, task_pairs):
+        """ Copy in one statement the checklist elements of the tasks
+
+            :param task_pairs: list of (source task id, copied task id)
+        """
+        if not task_pairs:
+            return
+        self.env.cr.execute("""
+            INSERT INTO project_task_checklist_item
+                        (sequence, task_id, company_id, name, checked, create_uid, create_date, write_uid, write_date)
+                 SELECT item.sequence, pairs.new_id, task.company_id, item.name, item.checked,
+                        %s, now() at time zone 'UTC', %s, now() at time zone 'UTC'
+                   FROM unnest(%s::int[], %s::int[]) AS pairs(old_id, new_id)
+                   JOIN project_task_checklist_item item ON item.task_id = pairs.old_id
+                   JOIN project_task task ON task.id = pairs.new_id
+               ORDER BY pairs.new_id, item.sequence, item.id
+        """, (self.env.uid, self.env.uid, [pair[0] for pair in task_pairs], [pair[1] for pair in task_pairs]))
+        self._recompute_checklist_progress([pair[1] for pair in task_pairs])
+
+    @api.multi
+    def _apply_checklist_template(self, template, replace=False):
+        """ Add the elements of the template to the checklist of the tasks with one statement,
+            replacing their current elements if replace is set.
+        """
+        if not self.ids:
+            return
+        cr = self.env.cr
+        Item = self.env['project_task_checklist.item']
+        Item.check_access_rights('create')
+        if replace:
+            # Only the elements the user can delete, as the ORM would do
+            Item.check_access_rights('unlink')
+            items = Item.search([('task_id', 'in', self.ids)])
+            items.check_access_rule('unlink')
+            if items:
+                cr.execute("DELETE FROM project_task_checklist_item WHERE id IN %s", (tuple(items.ids),))
+        cr.execute("""
+            INSERT INTO project_task_checklist_item
+                        (sequence, task_id, company_id, name, checked, create_uid, create_date, write_uid, write_date)
+                 SELECT template_item.sequence, task.id, task.company_id, template_item.name, false,
+                        %s, now() at time zone 'UTC', %s, now() at time zone 'UTC'
+                   FROM project_task task
+             CROSS JOIN project_task_checklist_template_item template_item
+                  WHERE task.id IN %s AND template_item.template_id = %s
+               ORDER BY task.id, template_item.sequence, template_item.id
+        """, (self.env.uid, self.env.uid, tuple(self.ids), template.id))
+        cr.execute("""
+            UPDATE project_task SET checklist_name = %s
+             WHERE id IN %s AND (checklist_name IS NULL OR checklist_name = '' OR %s)
+        """, (template.name, tuple(self.ids), replace))
+        self.invalidate_cache(['checklist_name'], self.ids)
+        self._recompute_checklist_progress(self.ids)
+
+    @api.multi
+    def _check_checklist_required(self, stage):
+        """ Raise if one of the tasks, just put in the stage, has unchecked elements, with one
+            query for all the tasks.
+        """
+        if not self.ids or not stage.checklist_required:
+            return
+        self.env.cr.execute("""
+            SELECT task_id, COUNT(*)
+              FROM project_task_checklist_item
+             WHERE task_id IN %s AND NOT COALESCE(checked, false)
+          GROUP BY task_id
+        """, (tuple(self.ids),))
+        pending = dict(self.env.cr.fetchall())
+        if pending:
+            tasks = self.browse(list(pending)).sudo()
+            lines = ['- %s (%d)' % (name, pending[task_id]) for task_id, name in tasks.name_get()]
+            raise UserError(_("The stage %s requires a complete checklist. "
+                              "These tasks have unchecked elements:\n%s") % (stage.name, '\n'.join(lines)))
+
+    @api.model
+    def create(self, vals):
+        task = super(ProjectTask, self).create(vals)
+        # The stage may come from the defaults
+        if task.stage_id.checklist_required:
+            task._check_checklist_required(task.stage_id)
+        return task
+
+    @api.multi
+    def write(self, vals):
+        if not vals.get('stage_id'):
+            return super(ProjectTask, self).write(vals)
+        stage = self.env['project.task.type'].browse(vals['stage_id'])
+        moved_tasks = self.filtered(lambda task: task.stage_id != stage) if stage.checklist_required else self
+        res = super(ProjectTask, self).write(vals)
+        # Check the elements as written, the same save may have checked or added some of them
+        moved_tasks._check_checklist_required(stage)
+        return res
+
+    @api.multi
+    def action_check_all_checklist_items(self):
+        """ Check all the elements of the checklists of the tasks with one statement """
+        if not self.ids:
+            return
+        self.check_access_rule('write')
+        self.env['project_task_checklist.item'].check_access_rights('write')
+        self.env.cr.execute("""
+            UPDATE project_task_checklist_item
+               SET checked = true, write_uid = %s, write_date = (now() at time zone 'UTC')
+             WHERE task_id IN %s AND NOT COALESCE(checked, false)
+        """, (self.env.uid, tuple(self.ids)))
+        self.env['project_task_checklist.item'].invalidate_cache(['checked'])
+        self._recompute_checklist_progress(self.ids)
+
+    @api.multi
+    def copy(self, default=None):
+        task = super(ProjectTask, self).copy(default)
+        if not self.env.context.get('checklist_copy_skip'):
+            self._copy_checklist_items([(self.id, task.id)])
+        return task
+
+
+class Project(models.Model):
+    _inherit = 'project.project'
+
+    @api.multi
+    def map_tasks(self, new_project_id):
+        # The tasks are copied without their checklist, then the elements of all of them are
+        # copied at once. The copies are created in the order of the tasks of the project.
+        old_tasks = self.tasks
+        res = super(Project, self.with_context(checklist_copy_skip=True)).map_tasks(new_project_id)
+        new_tasks = self.browse(new_project_id).with_context(active_test=False).tasks.sorted('id')
+        if len(new_tasks) != len(old_tasks):
+            raise UserError(_("The checklists of the tasks of the project %s could not be copied.") % self.name)
+        self.env['project.task']._copy_checklist_items(list(zip(old_tasks.ids, new_tasks.ids)))
+        return res
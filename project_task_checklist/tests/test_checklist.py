@@ -0,0 +1,123 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+from odoo.exceptions import UserError
+from odoo.tests.common import TransactionCase
+
+
+class TestChecklist(TransactionCase):
+
+    def setUp(self):
+        super(TestChecklist, self).setUp()
+        self.project = self.env['project.project'].create({'name': 'Checklist Project'})
+        self.stage_todo = self.env['project.task.type'].create({
+            'name': 'To do',
+            'sequence': 1,
+            'project_ids': [(6, 0, self.project.ids)],
+        })
+        self.stage_done = self.env['project.task.type'].create({
+            'name': 'Done',
+            'sequence': 2,
+            'checklist_required': True,
+            'project_ids': [(6, 0, self.project.ids)],
+        })
+        self.template = self.env['project_task_checklist.template'].create({
+            'name': 'Release',
+            'item_ids': [(0, 0, {'name': 'Build', 'sequence': 20}),
+                         (0, 0, {'name': 'Deploy', 'sequence': 30})],
+        })
+
+    def _create_task(self, name, items=()):
+        return self.env['project.task'].create({
+            'name': name,
+            'project_id': self.project.id,
+            'stage_id': self.stage_todo.id,
+            'checklist_item_ids': [(0, 0, {'name': item, 'checked': checked}) for item, checked in items],
+        })
+
+    def test_01_progress(self):
+        task = self._create_task('Task', [('One', True), ('Two', False)])
+        self.assertEqual((task.checklist_total, task.checklist_done, task.checklist_progress), (2, 1, 50.0))
+        task.checklist_item_ids.filtered(lambda i: not i.checked).checked = True
+        self.assertEqual((task.checklist_done, task.checklist_progress), (2, 100.0))
+        task.checklist_item_ids[0].unlink()
+        self.assertEqual((task.checklist_total, task.checklist_done), (1, 1))
+        groups = self.env['project.task'].read_group(
+            [('project_id', '=', self.project.id)], ['checklist_total', 'checklist_done'], ['project_id'])
+        self.assertEqual((groups[0]['checklist_total'], groups[0]['checklist_done']), (1, 1))
+
+    def test_02_apply_template(self):
+        tasks = self._create_task('First', [('Existing', True)]) + self._create_task('Second')
+        wizard = self.env['project_task_checklist.apply.template'].with_context(
+            active_model='project.task', active_ids=tasks.ids).create({'template_id': self.template.id})
+        wizard.apply_template()
+        self.assertEqual(tasks[0].checklist_item_ids.mapped('name'), ['Existing', 'Build', 'Deploy'])
+        self.assertEqual(tasks[1].checklist_item_ids.mapped('name'), ['Build', 'Deploy'])
+        self.assertEqual(tasks.mapped('checklist_name'), ['Release', 'Release'])
+        self.assertEqual(tasks.mapped('checklist_total'), [3, 2])
+        self.assertEqual(tasks[0].checklist_done, 1)
+        # Replace the checklists of every task of the project
+        self.env['project_task_checklist.apply.template'].create({
+            'template_id': self.template.id,
+            'apply_to': 'project',
+            'project_id': self.project.id,
+            'replace': True,
+        }).apply_template()
+        for task in tasks:
+            self.assertEqual(task.checklist_item_ids.mapped('name'), ['Build', 'Deploy'])
+            self.assertEqual((task.checklist_total, task.checklist_done), (2, 0))
+
+    def test_03_copy_task(self):
+        task = self._create_task('Task', [('One', True), ('Two', False)])
+        copy = task.copy()
+        self.assertEqual(copy.checklist_item_ids.mapped('name'), ['One', 'Two'])
+        self.assertEqual(copy.checklist_item_ids.mapped('checked'), [True, False])
+        self.assertNotEqual(copy.checklist_item_ids, task.checklist_item_ids)
+        self.assertEqual((copy.checklist_total, copy.checklist_done), (2, 1))
+
+    def test_04_copy_project(self):
+        first = self._create_task('First', [('One', True)])
+        second = self._create_task('Second', [('Two', False), ('Three', False)])
+        project = self.project.copy()
+        tasks = project.tasks
+        self.assertEqual(len(tasks), 2)
+        for task in (first, second):
+            copy = tasks.filtered(lambda t: t.name == task.name)
+            self.assertEqual(copy.checklist_item_ids.mapped('name'), task.checklist_item_ids.mapped('name'))
+            self.assertEqual(copy.checklist_total, task.checklist_total)
+        # The context of the copy does not leak the skip of the checklist to other copies
+        self.assertEqual(first.copy().checklist_total, 1)
+
+    def test_05_stage_gate(self):
+        complete = self._create_task('Complete', [('One', True)])
+        blocked = self._create_task('Blocked', [('One', False), ('Two', False)])
+        empty = self._create_task('Empty')
+        with self.assertRaisesRegex(UserError, 'Blocked \\(2\\)'):
+            (complete + blocked + empty).write({'stage_id': self.stage_done.id})
+        (complete + empty).write({'stage_id': self.stage_done.id})
+        self.assertEqual((complete + empty).mapped('stage_id'), self.stage_done)
+        # Checking the last elements in the same save as the move is allowed
+        blocked.write({
+            'stage_id': self.stage_done.id,
+            'checklist_item_ids': [(1, item.id, {'checked': True}) for item in blocked.checklist_item_ids],
+        })
+        self.assertEqual(blocked.stage_id, self.stage_done)
+        # Adding an unchecked element in the same save as the move is not
+        task = self._create_task('New element')
+        with self.assertRaises(UserError):
+            task.write({'stage_id': self.stage_done.id, 'checklist_item_ids': [(0, 0, {'name': 'Late'})]})
+        with self.assertRaises(UserError):
+            self.env['project.task'].create({
+                'name': 'Created done',
+                'project_id': self.project.id,
+                'stage_id': self.stage_done.id,
+                'checklist_item_ids': [(0, 0, {'name': 'One'})],
+            })
+
+    def test_06_check_all(self):
+        tasks = self._create_task('First', [('One', False)]) + self._create_task('Second', [('Two', False)])
+        tasks.action_check_all_checklist_items()
+        self.assertTrue(all(tasks.mapped('checklist_item_ids.checked')))
+        self.assertEqual(tasks.mapped('checklist_progress'), [100.0, 100.0])
+        tasks.write({'stage_id': self.stage_done.id})
@@ -0,0 +1,5 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+from . import apply_checklist_template
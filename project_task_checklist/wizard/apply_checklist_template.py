@@ -0,0 +1,53 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+
+class ApplyChecklistTemplate(models.TransientModel):
+    _name = 'project_task_checklist.apply.template'
+    _description = 'Apply Checklist Template'
+
+    @api.model
+    def _default_task_ids(self):
+        if self.env.context.get('active_model') == 'project.task':
+            return [(6, 0, self.env.context.get('active_ids', []))]
+        return []
+
+    template_id = fields.Many2one('project_task_checklist.template', string='Template', required=True)
+    apply_to = fields.Selection([
+        ('tasks', 'Selected tasks'),
+        ('stage', 'Tasks in a stage'),
+        ('project', 'Tasks of a project'),
+    ], string='Apply to', required=True, default='tasks')
+    task_ids = fields.Many2many('project.task', string='Tasks', default=_default_task_ids)
+    stage_id = fields.Many2one('project.task.type', string='Stage')
+    project_id = fields.Many2one('project.project', string='Project')
+    replace = fields.Boolean(string='Replace current checklist',
+                             help="Remove the current elements of the checklists before adding the template ones.")
+
+    def _get_tasks(self):
+        if self.apply_to == 'stage':
+            domain = [('stage_id', '=', self.stage_id.id)]
+            if self.project_id:
+                domain.append(('project_id', '=', self.project_id.id))
+            return self.env['project.task'].search(domain)
+        if self.apply_to == 'project':
+            return self.env['project.task'].search([('project_id', '=', self.project_id.id)])
+        return self.task_ids
+
+    @api.multi
+    def apply_template(self):
+        self.ensure_one()
+        if self.apply_to == 'stage' and not self.stage_id:
+            raise UserError(_("Select the stage of the tasks."))
+        if self.apply_to == 'project' and not self.project_id:
+            raise UserError(_("Select the project of the tasks."))
+        tasks = self._get_tasks()
+        if not tasks:
+            raise UserError(_("There is no task to apply the checklist template to."))
+        tasks.check_access_rule('write')
+        tasks._apply_checklist_template(self.template_id, replace=self.replace)
+        return {'type': 'ir.actions.act_window_close'}
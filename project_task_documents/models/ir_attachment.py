@@ -0,0 +1,49 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+from odoo import api, models
+
+
+class IrAttachment(models.Model):
+    _inherit = 'ir.attachment'
+
+    def _get_task_doc_counts(self):
+        """ Return {task id: number of attachments of self} for the documents of the tasks """
+        if not self.ids:
+            return {}
+        self.env.cr.execute("""
+            SELECT res_id, COUNT(*)
+              FROM ir_attachment
+             WHERE id IN %s AND res_model = 'project.task' AND res_id IS NOT NULL AND res_field IS NULL
+          GROUP BY res_id
+        """, (tuple(self.ids),))
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def create(self, vals):
+        attachment = super(IrAttachment, self).create(vals)
+        # The document may be linked to its task by the default_res_model/default_res_id context
+        if attachment.res_model == 'project.task' and attachment.res_id and not attachment.res_field:
+            self.env['project.task']._update_stored_doc_count({attachment.res_id: 1})
+        return attachment
+
+    @api.multi
+    def write(self, vals):
+        moved = {'res_model', 'res_id', 'res_field'} & set(vals)
+        if moved:
+            old_counts = self._get_task_doc_counts()
+        res = super(IrAttachment, self).write(vals)
+        if moved:
+            deltas = self._get_task_doc_counts()
+            for task_id, count in old_counts.items():
+                deltas[task_id] = deltas.get(task_id, 0) - count
+            self.env['project.task']._update_stored_doc_count(deltas)
+        return res
+
+    @api.multi
+    def unlink(self):
+        counts = self._get_task_doc_counts()
+        res = super(IrAttachment, self).unlink()
+        self.env['project.task']._update_stored_doc_count({task_id: -count for task_id, count in counts.items()})
+        return res
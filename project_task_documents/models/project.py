@@ -3,6 +3,7 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
 
 from odoo import api, fields, models, tools, SUPERUSER_ID, _
+from odoo.tools.sql import column_exists, create_column
 
 import logging
 
@@ -13,13 +14,72 @@ class ProjectTask(models.Model):
     _inherit = 'project.task'
 
     doc_count = fields.Integer(compute='_compute_attached_docs_count', string="Number of attached documents")
+    stored_doc_count = fields.Integer(string="Stored number of attached documents", readonly=True, copy=False,
+                                      help="Technical field kept up to date by the attachments, read by the "
+                                           "number of attached documents in stored counter mode.")
+
+    @api.model_cr_context
+    def _auto_init(self):
+        # Create and fill the counter in SQL, so that the ORM does not compute it task by task
+        if not column_exists(self.env.cr, self._table, 'stored_doc_count'):
+            create_column(self.env.cr, self._table, 'stored_doc_count', 'int4')
+            self._recompute_stored_doc_count()
+        return super(ProjectTask, self)._auto_init()
+
+    def _use_stored_doc_count(self):
+        return bool(self.env['ir.config_parameter'].sudo().get_param('project_task_documents.stored_doc_count'))
 
     def _compute_attached_docs_count(self):
-        attachment_obj = self.env['ir.attachment']
+        if self._use_stored_doc_count():
+            for task in self:
+                task.doc_count = task.stored_doc_count
+            return
+        # Count the attachments of all the tasks with one grouped query
+        counts = {}
+        task_ids = [task_id for task_id in self.ids if task_id]
+        if task_ids:
+            # read_group does not go through ir.attachment._search, which hides the attachments
+            # of binary fields, so they are filtered out here as in the stored counter
+            groups = self.env['ir.attachment'].read_group([
+                ('res_model', '=', 'project.task'), ('res_id', 'in', task_ids), ('res_field', '=', False),
+            ], ['res_id'], ['res_id'])
+            counts = {group['res_id']: group['res_id_count'] for group in groups}
         for task in self:
-            task.doc_count = attachment_obj.search_count([
-                '&', ('res_model', '=', 'project.task'), ('res_id', '=', task.id)
-            ])
+            task.doc_count = counts.get(task.id, 0)
+
+    @api.model
+    def _update_stored_doc_count(self, deltas):
+        """ Add the given number of documents to the stored counters of the tasks
+
+            :param deltas: dict mapping task ids to the number of attachments added (or removed if negative)
+        """
+        deltas = {task_id: delta for task_id, delta in deltas.items() if task_id and delta}
+        if not deltas:
+            return
+        self.env.cr.execute("""
+            UPDATE project_task task
+               SET stored_doc_count = GREATEST(COALESCE(task.stored_doc_count, 0) + vals.delta, 0)
+              FROM unnest(%s::int[], %s::int[]) AS vals(id, delta)
+             WHERE task.id = vals.id
+        """, (list(deltas), list(deltas.values())))
+        self.invalidate_cache(['stored_doc_count'], list(deltas))
+
+    @api.model
+    def _recompute_stored_doc_count(self):
+        """ Rebuild the stored counters of all the tasks in one statement """
+        self.env.cr.execute("""
+            UPDATE project_task task
+               SET stored_doc_count = COALESCE(attachment.doc_count, 0)
+              FROM project_task all_task
+         LEFT JOIN (SELECT res_id, COUNT(*) AS doc_count
+                      FROM ir_attachment
+                     WHERE res_model = 'project.task' AND res_field IS NULL
+                  GROUP BY res_id) attachment ON attachment.res_id = all_task.id
+             WHERE task.id = all_task.id
+               AND task.stored_doc_count IS DISTINCT FROM COALESCE(attachment.doc_count, 0)
+        """)
+        _logger.info("Recomputed the stored document counters of %d tasks", self.env.cr.rowcount)
+        self.invalidate_cache(['stored_doc_count'])
 
     @api.multi
     def attached_docs_view_action(self):
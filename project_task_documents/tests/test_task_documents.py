@@ -0,0 +1,77 @@
+# Copyright 2019 Fenix Engineering Solutions
+# @author Jose F. Fernandez
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+import base64
+
+from odoo.tests.common import TransactionCase
+
+
+class TestTaskDocuments(TransactionCase):
+
+    def setUp(self):
+        super(TestTaskDocuments, self).setUp()
+        self.project = self.env['project.project'].create({'name': 'Documents Project'})
+        self.tasks = self.env['project.task']
+        for name in ('First', 'Second'):
+            self.tasks += self.env['project.task'].create({'name': name, 'project_id': self.project.id})
+
+    def _attach(self, task, name, **values):
+        vals = {
+            'name': name,
+            'datas': base64.b64encode(b'document'),
+            'res_model': 'project.task',
+            'res_id': task.id,
+        }
+        vals.update(values)
+        return self.env['ir.attachment'].create(vals)
+
+    def _set_stored_mode(self, stored):
+        self.env['ir.config_parameter'].sudo().set_param('project_task_documents.stored_doc_count',
+                                                         stored and '1' or False)
+        self.tasks.invalidate_cache(['doc_count'])
+
+    def _check_counts(self, counts):
+        """ Check the counters in both modes and against a plain search_count """
+        for stored in (False, True):
+            self._set_stored_mode(stored)
+            self.assertEqual(self.tasks.mapped('doc_count'), counts)
+        self.assertEqual(counts, [self.env['ir.attachment'].search_count([
+            ('res_model', '=', 'project.task'), ('res_id', '=', task.id)]) for task in self.tasks])
+
+    def test_01_grouped_count(self):
+        self._attach(self.tasks[0], 'One')
+        self._attach(self.tasks[0], 'Two')
+        self._attach(self.tasks[1], 'Three')
+        # The attachment of a binary field is not a document of the task
+        self._attach(self.tasks[1], 'Field', res_field='description')
+        self._set_stored_mode(False)
+        self.assertEqual(self.tasks.mapped('doc_count'), [2, 1])
+
+    def test_02_stored_count_hooks(self):
+        first = self._attach(self.tasks[0], 'One')
+        self._attach(self.tasks[0], 'Two')
+        # Linked to its task by the context defaults of the documents action
+        action = self.tasks[1].attached_docs_view_action()
+        self.env['ir.attachment'].with_context(default_res_model='project.task',
+                                               default_res_id=self.tasks[1].id).create({
+            'name': 'Default',
+            'datas': base64.b64encode(b'document'),
+        })
+        self.assertIn("'default_res_id': %d" % self.tasks[1].id, action['context'])
+        self._check_counts([2, 1])
+        first.write({'res_id': self.tasks[1].id})
+        self._check_counts([1, 2])
+        first.write({'res_model': 'project.project', 'res_id': self.project.id})
+        self._check_counts([1, 1])
+        self.env['ir.attachment'].search([('res_model', '=', 'project.task'),
+                                          ('res_id', 'in', self.tasks.ids)]).unlink()
+        self._check_counts([0, 0])
+
+    def test_03_recompute(self):
+        self._attach(self.tasks[0], 'One')
+        self._attach(self.tasks[1], 'Two')
+        self.env.cr.execute("UPDATE project_task SET stored_doc_count = 5 WHERE id IN %s", (tuple(self.tasks.ids),))
+        self.tasks.invalidate_cache(['stored_doc_count'])
+        self.env['project.task']._recompute_stored_doc_count()
+        self._check_counts([1, 1])